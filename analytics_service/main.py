@@ -0,0 +1,236 @@
+from fastapi import FastAPI, HTTPException, Query
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Dict, Optional
+
+import httpx
+from prometheus_client import make_asgi_app, Counter, Histogram
+from opentelemetry import trace
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+
+from windows import RollingWindow, top_zones
+from runtime_metrics import start_runtime_monitor, stop_runtime_monitor
+
+MY_SERVICE_NAME = "analytics_service"
+SERVICE_URL = "http://analytics_service:8000"
+REGISTRY_URL = "http://service_registry:8000"
+GATEWAY_URL = os.getenv("GATEWAY_URL", "http://gateway_api:8000")
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL_SECONDS", 10))
+REGISTRATION_MAX_BACKOFF = 30.0
+
+ZONES = [zone.strip() for zone in os.getenv("ANALYTICS_ZONES", "A,B,C,D").split(",") if zone.strip()]
+SAMPLE_INTERVAL = float(os.getenv("ANALYTICS_INTERVAL_SECONDS", 5))
+# Number of samples kept per zone (120 x 5s = the last 10 minutes)
+WINDOW_SIZE = int(os.getenv("ANALYTICS_WINDOW", 120))
+
+# Zone-level signals: each is the mean over the zone's sensors of a per-sensor value
+SIGNALS = {
+    "traffic.congestion_ratio": ("traffic", lambda s: s["status"] == "CONGESTED"),
+    "traffic.vehicle_count_avg": ("traffic", lambda s: s["vehicle_count"]),
+    "energy.load_avg": ("energy", lambda s: s["load_percent"]),
+    "energy.overload_ratio": ("energy", lambda s: s["status"] == "CRITICAL_OVERLOAD"),
+    "water.ph_avg": ("water", lambda s: s["ph_level"]),
+    "waste.fill_avg": ("waste", lambda s: s["fill_level_percent"]),
+    "security.people_avg": ("security", lambda s: s["people_detected"]),
+    "security.crowd_alert_ratio": ("security", lambda s: s["status"] != "SAFE"),
+    "health.icu_avg": ("health", lambda s: s["icu_occupancy_percent"]),
+    "health.ambulances_avg": ("health", lambda s: s["available_ambulances"]),
+}
+
+DOMAIN_FIELDS = {
+    "traffic": "status,vehicle_count",
+    "energy": "status,load_percent",
+    "water": "ph_level",
+    "waste": "fill_level_percent",
+    "security": "status,people_detected",
+    "health": "icu_occupancy_percent,available_ambulances",
+}
+
+WINDOWS: Dict[str, RollingWindow] = {zone_id: RollingWindow(SIGNALS, WINDOW_SIZE) for zone_id in ZONES}
+
+SERVICE_STATE = {"ready": False, "registered": False, "tasks": []}
+
+def setup_jaeger():
+    resource = Resource(attributes={SERVICE_NAME: MY_SERVICE_NAME})
+    provider = TracerProvider(resource=resource)
+    trace.set_tracer_provider(provider)
+    otlp_exporter = OTLPSpanExporter(endpoint="http://jaeger:4317", insecure=True)
+    provider.add_span_processor(BatchSpanProcessor(otlp_exporter))
+
+setup_jaeger()
+
+app = FastAPI()
+FastAPIInstrumentor.instrument_app(app)
+
+REQUEST_COUNT = Counter('app_request_count', 'Request Count', ['method', 'endpoint', 'http_status'])
+REQUEST_LATENCY = Histogram('app_request_latency_seconds', 'Request Latency', ['method', 'endpoint'])
+SAMPLE_ERRORS = Counter('analytics_sample_errors_total', 'Failed domain samples', ['domain'])
+metrics_app = make_asgi_app()
+app.mount("/metrics", metrics_app)
+
+# Event-loop lag, threadpool saturation and GC pauses; THREADPOOL_SIZE resizes the pool
+@app.on_event("startup")
+async def start_runtime_metrics():
+    await start_runtime_monitor()
+
+@app.on_event("shutdown")
+async def stop_runtime_metrics():
+    await stop_runtime_monitor()
+
+async def sample_domain(client: httpx.AsyncClient, zone_id: str, domain: str) -> Dict[str, Optional[float]]:
+    """Streams one zone/domain snapshot and reduces it to its signals in constant memory."""
+    signals = {name: extract for name, (signal_domain, extract) in SIGNALS.items() if signal_domain == domain}
+    totals = {name: 0.0 for name in signals}
+    count = 0
+
+    async with client.stream(
+        "GET", f"/{domain}/zone/{zone_id}",
+        params={"fields": DOMAIN_FIELDS[domain], "format": "ndjson"}
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            sensor = json.loads(line)
+            count += 1
+            for name, extract in signals.items():
+                totals[name] += float(extract(sensor))
+
+    if count == 0:
+        return {name: None for name in signals}
+    return {name: total / count for name, total in totals.items()}
+
+async def sample_zone(client: httpx.AsyncClient, zone_id: str):
+    domains = list(DOMAIN_FIELDS)
+    results = await asyncio.gather(*(sample_domain(client, zone_id, domain) for domain in domains), return_exceptions=True)
+
+    values: Dict[str, Optional[float]] = {}
+    for domain, result in zip(domains, results):
+        if isinstance(result, Exception):
+            SAMPLE_ERRORS.labels(domain=domain).inc()
+            continue
+        values.update(result)
+    WINDOWS[zone_id].push(values)
+
+async def sampling_loop():
+    # Bulk background reads: the gateway sheds them before interactive traffic on any domain
+    async with httpx.AsyncClient(base_url=GATEWAY_URL, timeout=5.0, headers={"X-Request-Priority": "low"}) as client:
+        while True:
+            started = time.monotonic()
+            await asyncio.gather(*(sample_zone(client, zone_id) for zone_id in ZONES))
+            await asyncio.sleep(max(0.0, SAMPLE_INTERVAL - (time.monotonic() - started)))
+
+async def registration_loop():
+    # Registers and then keeps heartbeating; failures back off exponentially with full jitter
+    backoff = 0.5
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while True:
+            try:
+                response = await client.post(f"{REGISTRY_URL}/register", json={
+                    "name": MY_SERVICE_NAME,
+                    "url": SERVICE_URL,
+                    "ready": SERVICE_STATE["ready"]
+                })
+                response.raise_for_status()
+                if not SERVICE_STATE["registered"]:
+                    print(f"Registered {MY_SERVICE_NAME}")
+                SERVICE_STATE["registered"] = True
+                backoff = 0.5
+                await asyncio.sleep(HEARTBEAT_INTERVAL)
+            except httpx.HTTPError:
+                SERVICE_STATE["registered"] = False
+                await asyncio.sleep(random.uniform(0, backoff))
+                backoff = min(backoff * 2, REGISTRATION_MAX_BACKOFF)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    SERVICE_STATE["ready"] = True
+    SERVICE_STATE["tasks"] = [
+        asyncio.create_task(sampling_loop()),
+        asyncio.create_task(registration_loop())
+    ]
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    SERVICE_STATE["ready"] = False
+    for task in SERVICE_STATE["tasks"]:
+        task.cancel()
+    async with httpx.AsyncClient(timeout=1.0) as client:
+        try:
+            await client.post(f"{REGISTRY_URL}/register", json={"name": MY_SERVICE_NAME, "url": SERVICE_URL, "ready": False})
+        except httpx.HTTPError:
+            pass
+
+@app.get("/live")
+def liveness():
+    return {"status": "alive"}
+
+@app.get("/ready")
+def readiness():
+    if not SERVICE_STATE["ready"]:
+        raise HTTPException(status_code=503, detail="Service not ready")
+    return {"status": "ready", "registered": SERVICE_STATE["registered"]}
+
+@app.get("/")
+def read_root():
+    return {"service": "Cross-Domain Analytics", "status": "active"}
+
+def check_signal(signal: str):
+    if signal not in SIGNALS:
+        raise HTTPException(status_code=400, detail=f"Unknown signal, expected one of {sorted(SIGNALS)}")
+
+def check_zone(zone_id: str) -> RollingWindow:
+    window = WINDOWS.get(zone_id)
+    if window is None:
+        raise HTTPException(status_code=404, detail="Zone not tracked")
+    return window
+
+@app.get("/analytics/signals")
+def list_signals():
+    return {"signals": sorted(SIGNALS), "zones": ZONES, "window": WINDOW_SIZE, "interval_seconds": SAMPLE_INTERVAL}
+
+@app.get("/analytics/correlation")
+def get_correlation(x: str, y: str, zone: Optional[str] = None):
+    with REQUEST_LATENCY.labels(method="GET", endpoint="/analytics/correlation").time():
+        check_signal(x)
+        check_signal(y)
+        if x == y:
+            raise HTTPException(status_code=400, detail="x and y must be different signals")
+
+        zones = [zone] if zone else ZONES
+        results = []
+        for zone_id in zones:
+            r, n = check_zone(zone_id).correlation(x, y)
+            results.append({"zone": zone_id, "r": None if r is None else round(r, 4), "samples": n})
+
+        REQUEST_COUNT.labels(method="GET", endpoint="/analytics/correlation", http_status=200).inc()
+        return {"x": x, "y": y, "results": results}
+
+@app.get("/analytics/top")
+def get_top_zones(signal: str, k: int = Query(3, ge=1, le=100)):
+    with REQUEST_LATENCY.labels(method="GET", endpoint="/analytics/top").time():
+        check_signal(signal)
+        REQUEST_COUNT.labels(method="GET", endpoint="/analytics/top", http_status=200).inc()
+        return {"signal": signal, "zones": top_zones(WINDOWS, signal, k)}
+
+@app.get("/analytics/zone/{zone_id}")
+def get_zone_summary(zone_id: str, k: int = Query(5, ge=1, le=50)):
+    with REQUEST_LATENCY.labels(method="GET", endpoint="/analytics/zone").time():
+        window = check_zone(zone_id)
+        REQUEST_COUNT.labels(method="GET", endpoint="/analytics/zone", http_status=200).inc()
+        return {
+            "zone": zone_id,
+            "samples": len(window.ticks),
+            "means": {
+                signal: None if window.mean(signal) is None else round(window.mean(signal), 4)
+                for signal in SIGNALS
+            },
+            "strongest_correlations": window.strongest_correlations(k)
+        }
@@ -0,0 +1,66 @@
+import asyncio
+import gc
+import os
+import threading
+import time
+from typing import Optional
+
+from anyio import to_thread
+from prometheus_client import Gauge, Histogram
+
+EVENT_LOOP_LAG = Histogram(
+    'app_event_loop_lag_seconds', 'Delay of a periodic timer on the event loop beyond its schedule',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+THREADPOOL_SIZE = Gauge('app_threadpool_size', 'Worker threads available to sync handlers')
+THREADPOOL_ACTIVE = Gauge('app_threadpool_active_threads', 'Worker threads currently running a task')
+THREADPOOL_QUEUE = Gauge('app_threadpool_queue_depth', 'Tasks waiting for a free worker thread')
+THREADS = Gauge('app_threads', 'Live threads in the process')
+GC_PAUSE = Histogram(
+    'app_gc_pause_seconds', 'Time the interpreter spent in garbage collection', ['generation'],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+
+SAMPLE_INTERVAL = float(os.getenv("RUNTIME_METRICS_INTERVAL_SECONDS", 0.5))
+# Size of the threadpool that runs sync handlers and streamed bodies (anyio's default is 40)
+THREADPOOL_TOKENS = os.getenv("THREADPOOL_SIZE")
+
+STATE = {"task": None, "gc_started": None}
+
+
+def gc_callback(phase: str, info: dict):
+    if phase == "start":
+        STATE["gc_started"] = time.perf_counter()
+    elif STATE["gc_started"] is not None:
+        GC_PAUSE.labels(generation=str(info["generation"])).observe(time.perf_counter() - STATE["gc_started"])
+        STATE["gc_started"] = None
+
+
+async def monitor_loop(interval: float = SAMPLE_INTERVAL):
+    """Samples loop lag and threadpool occupancy; both are read on the loop itself."""
+    limiter = to_thread.current_default_thread_limiter()
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - started - interval))
+
+        THREADPOOL_SIZE.set(limiter.total_tokens)
+        THREADPOOL_ACTIVE.set(limiter.borrowed_tokens)
+        THREADPOOL_QUEUE.set(limiter.statistics().tasks_waiting)
+        THREADS.set(threading.active_count())
+
+
+async def start_runtime_monitor(threadpool_size: Optional[str] = THREADPOOL_TOKENS, interval: float = SAMPLE_INTERVAL):
+    if threadpool_size:
+        to_thread.current_default_thread_limiter().total_tokens = int(threadpool_size)
+    if gc_callback not in gc.callbacks:
+        gc.callbacks.append(gc_callback)
+    STATE["task"] = asyncio.create_task(monitor_loop(interval))
+
+
+async def stop_runtime_monitor():
+    if STATE["task"] is not None:
+        STATE["task"].cancel()
+        STATE["task"] = None
+    if gc_callback in gc.callbacks:
+        gc.callbacks.remove(gc_callback)
@@ -0,0 +1,68 @@
+import sys
+import os
+import math
+import random
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from windows import RollingWindow, top_zones
+
+def pearson(xs, ys):
+    n = len(xs)
+    mx, my = sum(xs) / n, sum(ys) / n
+    cov = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+    return cov / math.sqrt(sum((x - mx) ** 2 for x in xs) * sum((y - my) ** 2 for y in ys))
+
+# The incremental result matches a full recomputation over the window
+def test_correlation_matches_window_recomputation():
+    rng = random.Random(7)
+    window = RollingWindow(["a", "b"], size=50)
+    history = []
+    for _ in range(500):
+        a = rng.uniform(0, 100)
+        b = 0.5 * a + rng.uniform(-20, 20)
+        window.push({"a": a, "b": b})
+        history.append((a, b))
+
+    last = history[-50:]
+    r, n = window.correlation("b", "a")
+    assert n == 50
+    assert abs(r - pearson([a for a, _ in last], [b for _, b in last])) < 1e-9
+
+def test_missing_values_are_skipped_per_pair():
+    window = RollingWindow(["a", "b", "c"], size=10)
+    for i in range(10):
+        window.push({"a": i, "b": 2 * i, "c": None if i % 2 else -i})
+
+    assert window.correlation("a", "b") == (1.0, 10)
+    r, n = window.correlation("a", "c")
+    assert n == 5
+    assert abs(r + 1.0) < 1e-9
+    assert window.mean("c") == -4.0
+
+def test_constant_signal_has_no_correlation():
+    window = RollingWindow(["a", "b"], size=10)
+    for i in range(10):
+        window.push({"a": 1.0, "b": i})
+    assert window.correlation("a", "b") == (None, 10)
+
+def test_top_zones_by_mean():
+    windows = {zone: RollingWindow(["a"], size=5) for zone in "ABCD"}
+    for value, zone in enumerate("ABCD"):
+        windows[zone].push({"a": value})
+
+    assert [item["zone"] for item in top_zones(windows, "a", 2)] == ["D", "C"]
+
+# Days of add/subtract must not turn constant signals into spurious correlations
+def test_constant_signals_stay_uncorrelated_over_long_runs():
+    for seed in range(3):
+        rng = random.Random(seed)
+        window = RollingWindow(["x", "y", "z"], size=120)
+        # Constants that are not exact binary fractions leave rounding residue in the sums
+        for _ in range(100_000):
+            window.push({"x": 300.3, "y": 1.7 if rng.random() > 0.1 else None, "z": rng.uniform(0, 1000)})
+
+        assert window.correlation("x", "y")[0] is None
+        assert window.correlation("x", "z")[0] is None
+        assert window.correlation("y", "z")[0] is None
+        assert abs(window.mean("x") - 300.3) < 1e-9
@@ -0,0 +1,103 @@
+import heapq
+import math
+from collections import deque
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Variances below this fraction of n * sum(x^2) are treated as zero
+RELATIVE_EPSILON = 1e-9
+
+
+class RollingWindow:
+    """Last ``size`` ticks of zone-level signals with running sums.
+
+    Each tick adds its values to the sums and the tick falling out of the
+    window subtracts them again, so means and pairwise correlations are
+    O(1) to read. Add/subtract leaves floating-point residue behind, so the
+    sums are rebuilt from the stored ticks once every ``size`` evictions,
+    which keeps the amortized cost per tick unchanged. Memory is
+    O(size * signals).
+    """
+
+    def __init__(self, signals: Iterable[str], size: int):
+        self.signals = list(signals)
+        self.size = size
+        self.ticks = deque()
+        self.evictions = 0
+        self._reset()
+
+    def _reset(self):
+        self.count = {signal: 0 for signal in self.signals}
+        self.total = {signal: 0.0 for signal in self.signals}
+        # Per pair: [n, sum_x, sum_y, sum_xy, sum_xx, sum_yy] over ticks where both are present
+        self.pairs = {pair: [0, 0.0, 0.0, 0.0, 0.0, 0.0] for pair in combinations(sorted(self.signals), 2)}
+
+    def push(self, values: Dict[str, Optional[float]]):
+        if len(self.ticks) == self.size:
+            self._apply(self.ticks.popleft(), -1)
+            self.evictions += 1
+        self.ticks.append(values)
+        self._apply(values, 1)
+        if self.evictions >= self.size:
+            self._rebuild()
+
+    def _rebuild(self):
+        self._reset()
+        for values in self.ticks:
+            self._apply(values, 1)
+        self.evictions = 0
+
+    def _apply(self, values: Dict[str, Optional[float]], sign: int):
+        for signal in self.signals:
+            value = values.get(signal)
+            if value is not None:
+                self.count[signal] += sign
+                self.total[signal] += sign * value
+
+        for (x, y), sums in self.pairs.items():
+            vx = values.get(x)
+            vy = values.get(y)
+            if vx is None or vy is None:
+                continue
+            sums[0] += sign
+            sums[1] += sign * vx
+            sums[2] += sign * vy
+            sums[3] += sign * vx * vy
+            sums[4] += sign * vx * vx
+            sums[5] += sign * vy * vy
+
+    def mean(self, signal: str) -> Optional[float]:
+        if not self.count.get(signal):
+            return None
+        return self.total[signal] / self.count[signal]
+
+    def correlation(self, x: str, y: str) -> Tuple[Optional[float], int]:
+        """Pearson correlation of two signals and the number of ticks it is based on."""
+        pair = tuple(sorted((x, y)))
+        n, sx, sy, sxy, sxx, syy = self.pairs[pair]
+        if n < 2:
+            return None, n
+        var_x = n * sxx - sx * sx
+        var_y = n * syy - sy * sy
+        # Relative to the magnitude of the sums: constant signals leave only rounding residue
+        if var_x <= RELATIVE_EPSILON * n * sxx or var_y <= RELATIVE_EPSILON * n * syy:
+            return None, n
+        r = (n * sxy - sx * sy) / math.sqrt(var_x * var_y)
+        return max(-1.0, min(1.0, r)), n
+
+    def strongest_correlations(self, k: int) -> List[dict]:
+        results = []
+        for x, y in self.pairs:
+            r, n = self.correlation(x, y)
+            if r is not None:
+                results.append({"x": x, "y": y, "r": round(r, 4), "samples": n})
+        return heapq.nlargest(k, results, key=lambda item: abs(item["r"]))
+
+
+def top_zones(windows: Dict[str, RollingWindow], signal: str, k: int) -> List[dict]:
+    means = []
+    for zone_id, window in windows.items():
+        mean = window.mean(signal)
+        if mean is not None:
+            means.append({"zone": zone_id, "mean": round(mean, 4), "samples": window.count[signal]})
+    return heapq.nlargest(k, means, key=lambda item: item["mean"])
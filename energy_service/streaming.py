@@ -0,0 +1,73 @@
+import base64
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from profiling import stage
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+MAX_SENSORS_PER_ZONE = int(os.getenv("MAX_SENSORS_PER_ZONE", 50000))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 5000))
+# Sensors generated, recorded and serialized per step of a streamed response
+STREAM_BATCH_SIZE = 500
+
+
+def zone_sensor_counts() -> Dict[str, int]:
+    """ZONE_SENSOR_COUNTS="A=20000,B=5000" fixes the size of specific zones."""
+    counts = {}
+    for item in os.getenv("ZONE_SENSOR_COUNTS", "").split(","):
+        if "=" not in item:
+            continue
+        zone_id, count = item.split("=", 1)
+        counts[zone_id.strip()] = min(int(count), MAX_SENSORS_PER_ZONE)
+    return counts
+
+
+def sensor_range(default: Tuple[int, int]) -> Tuple[int, int]:
+    """SENSORS_PER_ZONE="low-high" overrides the random size of unconfigured zones."""
+    raw = os.getenv("SENSORS_PER_ZONE")
+    if not raw:
+        return default
+    low, _, high = raw.partition("-")
+    low = min(int(low), MAX_SENSORS_PER_ZONE)
+    return low, min(int(high or low), MAX_SENSORS_PER_ZONE)
+
+
+def encode_cursor(zone_id: str, index: int) -> str:
+    return base64.urlsafe_b64encode(f"{zone_id}:{index}".encode()).decode()
+
+
+def decode_cursor(zone_id: str, cursor: Optional[str]) -> int:
+    """Returns the 1-based sensor index a cursor points at (1 without a cursor)."""
+    if not cursor:
+        return 1
+    try:
+        cursor_zone, index = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit(":", 1)
+        index = int(index)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_zone != zone_id or index < 1:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return index
+
+
+def page_bounds(zone_id: str, num_sensors: int, cursor: Optional[str], limit: Optional[int]):
+    """Returns (start, stop, next_cursor) for the 1-based half-open range [start, stop)."""
+    start = decode_cursor(zone_id, cursor)
+    stop = num_sensors + 1 if limit is None else min(num_sensors + 1, start + limit)
+    next_cursor = encode_cursor(zone_id, stop) if stop <= num_sensors else None
+    return start, stop, next_cursor
+
+
+def wants_ndjson(request: Request, format: Optional[str]) -> bool:
+    return format == "ndjson" or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_lines(batches: Iterable[List[dict]]):
+    for batch in batches:
+        with stage("serialize"):
+            chunk = "".join(json.dumps(sensor) + "\n" for sensor in batch)
+        yield chunk
@@ -1,50 +1,180 @@
 # frontend/main.py
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 import httpx
+from prometheus_client import make_asgi_app
 import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+from runtime_metrics import start_runtime_monitor, stop_runtime_monitor
 
 app = FastAPI()
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+metrics_app = make_asgi_app()
+app.mount("/metrics", metrics_app)
+
+# Event-loop lag, threadpool saturation and GC pauses; THREADPOOL_SIZE resizes the pool
+@app.on_event("startup")
+async def start_runtime_metrics():
+    await start_runtime_monitor()
+
+@app.on_event("shutdown")
+async def stop_runtime_metrics():
+    await stop_runtime_monitor()
+
+STATIC_DIR = "static"
+
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 templates = Jinja2Templates(directory="templates")
 
 GATEWAY_URL = "http://gateway_api:8000"
 
+SERVICES = ["traffic", "energy", "water", "waste", "security", "health"]
+
+# Only the columns each panel renders are requested from the gateway
+PANEL_FIELDS = {
+    "traffic": "id,vehicle_count,status",
+    "energy": "id,load_percent,voltage_v,status",
+    "water": "id,ph_level,turbidity_ntu,status",
+    "waste": "id,type,fill_level_percent,status",
+    "security": "id,people_detected,status",
+    "health": "id,icu_occupancy_percent,available_ambulances,status",
+}
+
+# Rendered panels are reused across page views for this many seconds
+FRAGMENT_TTL = float(os.getenv("FRAGMENT_TTL_SECONDS", 5))
+PANEL_REFRESH_SECONDS = float(os.getenv("PANEL_REFRESH_SECONDS", 5))
+# Large zones only show their first page of sensors
+PANEL_SENSOR_LIMIT = int(os.getenv("PANEL_SENSOR_LIMIT", 200))
+
+FRAGMENT_CACHE_MAX_ENTRIES = 1000
+
+# Least recently used panels are evicted first once the cache is full
+FRAGMENT_CACHE: "OrderedDict[tuple, dict]" = OrderedDict()
+
+def build_asset_manifest():
+    manifest = {}
+    for name in os.listdir(STATIC_DIR):
+        path = os.path.join(STATIC_DIR, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        root, ext = os.path.splitext(name)
+        manifest[name] = f"{root}.{digest}{ext}"
+    return manifest
+
+ASSET_MANIFEST = build_asset_manifest()
+HASHED_ASSETS = {hashed: name for name, hashed in ASSET_MANIFEST.items()}
+
+def asset_url(name: str) -> str:
+    return f"/assets/{ASSET_MANIFEST[name]}"
+
+templates.env.globals["asset_url"] = asset_url
+
+@app.on_event("startup")
+async def open_http_client():
+    app.state.http_client = httpx.AsyncClient(
+        base_url=GATEWAY_URL,
+        timeout=4.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    )
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await app.state.http_client.aclose()
+
+@app.get("/assets/{filename}")
+def get_asset(filename: str):
+    name = HASHED_ASSETS.get(filename)
+    if name is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    # The name changes whenever the content does, so browsers may keep it forever
+    return FileResponse(
+        os.path.join(STATIC_DIR, name),
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+def render_panel(service: str, items: list) -> dict:
+    html = templates.get_template(f"panels/{service}.html").render(items=items)
+    return {
+        "html": html,
+        "version": hashlib.sha1(html.encode()).hexdigest()[:12],
+        "expires": time.monotonic() + FRAGMENT_TTL
+    }
+
+async def fetch_panel(zone_id: str, service: str):
+    """Returns (panel, error) for one domain, using the fragment cache when fresh."""
+    key = (zone_id, service)
+    cached = FRAGMENT_CACHE.get(key)
+    if cached and cached["expires"] > time.monotonic():
+        FRAGMENT_CACHE.move_to_end(key)
+        return cached, None
+
+    try:
+        resp = await app.state.http_client.get(
+            f"/{service}/zone/{zone_id}", params={"fields": PANEL_FIELDS[service], "limit": PANEL_SENSOR_LIMIT}
+        )
+    except httpx.HTTPError:
+        error = f"{service.capitalize()}: Connection Error"
+    else:
+        if resp.status_code == 200:
+            panel = render_panel(service, resp.json())
+            FRAGMENT_CACHE[key] = panel
+            FRAGMENT_CACHE.move_to_end(key)
+            # Zone ids come straight from the URL, so the bound has to hold even when every entry is fresh
+            while len(FRAGMENT_CACHE) > FRAGMENT_CACHE_MAX_ENTRIES:
+                FRAGMENT_CACHE.popitem(last=False)
+            return panel, None
+        error = f"{service.capitalize()}: Service Unavailable"
+
+    # Keep showing the last good panel (if any) next to the error
+    return cached or render_panel(service, []), error
+
+async def fetch_panels(zone_id: str):
+    results = await asyncio.gather(*(fetch_panel(zone_id, service) for service in SERVICES))
+    panels = {}
+    errors = []
+    for service, (panel, error) in zip(SERVICES, results):
+        panels[service] = panel
+        if error:
+            errors.append(error)
+    return panels, errors
+
 @app.get("/", response_class=HTMLResponse)
 async def read_map(request: Request):
-    return templates.TemplateResponse("map.html", {"request": request})
+    return templates.TemplateResponse(request, "map.html")
 
 @app.get("/zone/{zone_id}", response_class=HTMLResponse)
 async def read_zone_details(request: Request, zone_id: str):
-    
-    services = ["traffic", "energy", "water", "waste", "security", "health"]
-    
-    data = {service: [] for service in services}
-    errors = []
+    panels, errors = await fetch_panels(zone_id)
 
-    async with httpx.AsyncClient() as client:
-        tasks = []
-        for service in services:
-            url = f"{GATEWAY_URL}/{service}/zone/{zone_id}"
-            tasks.append(client.get(url, timeout=4.0))
-
-        responses = await asyncio.gather(*tasks, return_exceptions=True)
-
-        for i, service in enumerate(services):
-            resp = responses[i]
-            if isinstance(resp, Exception):
-                errors.append(f"{service.capitalize()}: Connection Error")
-            elif resp.status_code == 200:
-                data[service] = resp.json()
-            else:
-                errors.append(f"{service.capitalize()}: Service Unavailable")
-
-    return templates.TemplateResponse("zone_details.html", {
-        "request": request,
+    return templates.TemplateResponse(request, "zone_details.html", {
         "zone_id": zone_id,
-        "data": data,
+        "panels": [
+            {"domain": service, "html": panel["html"], "version": panel["version"]}
+            for service, panel in panels.items()
+        ],
+        "errors": errors,
+        "refresh_ms": int(PANEL_REFRESH_SECONDS * 1000)
+    })
+
+@app.get("/zone/{zone_id}/panels")
+async def read_zone_panels(zone_id: str, known: str = ""):
+    """Panels whose version differs from the `domain:version` pairs the page already has."""
+    known_versions = dict(pair.split(":", 1) for pair in known.split(",") if ":" in pair)
+    panels, errors = await fetch_panels(zone_id)
+
+    return {
+        "panels": {
+            service: {"html": panel["html"], "version": panel["version"]}
+            for service, panel in panels.items()
+            if known_versions.get(service) != panel["version"]
+        },
         "errors": errors
-    })
\ No newline at end of file
+    }
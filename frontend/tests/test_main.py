@@ -0,0 +1,97 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+import main
+
+class FakeGateway:
+    """Answers zone requests with one sensor whose fields all carry ``value``."""
+
+    def __init__(self):
+        self.calls = []
+        self.value = 1
+        self.status_code = 200
+
+    def handler(self, request):
+        self.calls.append(request.url.path)
+        if self.status_code != 200:
+            return httpx.Response(self.status_code, json={"detail": "down"})
+        fields = request.url.params["fields"].split(",")
+        return httpx.Response(200, json=[{field: self.value for field in fields}])
+
+@pytest.fixture
+def gateway():
+    main.FRAGMENT_CACHE.clear()
+    fake = FakeGateway()
+    with TestClient(main.app) as client:
+        main.app.state.http_client = httpx.AsyncClient(
+            base_url=main.GATEWAY_URL, transport=httpx.MockTransport(fake.handler)
+        )
+        fake.client = client
+        yield fake
+
+def test_zone_page_renders_every_panel(gateway):
+    response = gateway.client.get("/zone/A")
+    assert response.status_code == 200
+    for service in main.SERVICES:
+        assert f"/{service}/zone/A" in gateway.calls
+
+# Fresh panels are served from the cache without asking the gateway again
+def test_fragments_are_cached_until_they_expire(gateway):
+    gateway.client.get("/zone/A")
+    assert len(gateway.calls) == len(main.SERVICES)
+
+    gateway.client.get("/zone/A")
+    assert len(gateway.calls) == len(main.SERVICES)
+
+    for panel in main.FRAGMENT_CACHE.values():
+        panel["expires"] = 0
+    gateway.client.get("/zone/A")
+    assert len(gateway.calls) == 2 * len(main.SERVICES)
+
+def test_cache_evicts_least_recently_used_entries(gateway, monkeypatch):
+    monkeypatch.setattr(main, "FRAGMENT_CACHE_MAX_ENTRIES", 2 * len(main.SERVICES))
+    gateway.client.get("/zone/A")
+    gateway.client.get("/zone/B")
+    # A hit makes A the most recently used zone, so C pushes out B
+    gateway.client.get("/zone/A")
+    gateway.client.get("/zone/C")
+
+    zones = {zone_id for zone_id, _ in main.FRAGMENT_CACHE}
+    assert len(main.FRAGMENT_CACHE) == 2 * len(main.SERVICES)
+    assert zones == {"A", "C"}
+
+# Only panels whose version changed are sent back
+def test_panels_endpoint_skips_known_versions(gateway):
+    first = gateway.client.get("/zone/A/panels").json()
+    assert set(first["panels"]) == set(main.SERVICES)
+    known = ",".join(f"{service}:{panel['version']}" for service, panel in first["panels"].items())
+
+    assert gateway.client.get("/zone/A/panels", params={"known": known}).json()["panels"] == {}
+
+    for panel in main.FRAGMENT_CACHE.values():
+        panel["expires"] = 0
+    gateway.value = 2
+    changed = gateway.client.get("/zone/A/panels", params={"known": known}).json()
+    assert set(changed["panels"]) == set(main.SERVICES)
+
+def test_failed_refresh_keeps_last_good_panel(gateway):
+    first = gateway.client.get("/zone/A/panels").json()
+    for panel in main.FRAGMENT_CACHE.values():
+        panel["expires"] = 0
+    gateway.status_code = 503
+
+    response = gateway.client.get("/zone/A/panels").json()
+    assert response["panels"]["traffic"]["version"] == first["panels"]["traffic"]["version"]
+    assert "Traffic: Service Unavailable" in response["errors"]
+
+def test_hashed_assets_are_immutable(gateway):
+    hashed = main.asset_url("styles.css")
+    response = gateway.client.get(hashed)
+    assert response.status_code == 200
+    assert "immutable" in response.headers["cache-control"]
+    assert gateway.client.get("/assets/styles.000000000000.css").status_code == 404
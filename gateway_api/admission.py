@@ -0,0 +1,138 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+REQUESTS_REJECTED = Counter(
+    'gateway_requests_rejected_total', 'Requests rejected by admission control', ['route', 'reason']
+)
+INFLIGHT_REQUESTS = Gauge('gateway_inflight_requests', 'Requests currently being served')
+
+PRIORITIES = {"critical": 0, "normal": 1, "low": 2}
+
+# Share of ADMISSION_MAX_INFLIGHT at which each priority starts being shed
+INFLIGHT_SHED_FRACTION = {"critical": 1.0, "normal": 0.8, "low": 0.5}
+# Multiple of the latency target at which each priority starts being shed
+LATENCY_SHED_FACTOR = {"critical": None, "normal": 2.0, "low": 1.0}
+
+
+def parse_mapping(raw: str) -> Dict[str, str]:
+    """Parses "a=x,b=y" style env values."""
+    pairs = (item.split("=", 1) for item in raw.split(",") if "=" in item)
+    return {key.strip(): value.strip() for key, value in pairs}
+
+
+ROUTE_PRIORITIES = parse_mapping(os.getenv(
+    "ROUTE_PRIORITIES", "health=critical,security=critical,traffic=normal,energy=normal,water=normal,waste=low,analytics=low"
+))
+ROUTE_RATE_LIMITS = {
+    route: float(rate) for route, rate in parse_mapping(os.getenv("ROUTE_RATE_LIMITS", "")).items()
+}
+CLIENT_RATE_LIMIT = float(os.getenv("CLIENT_RATE_LIMIT", 50))
+CLIENT_BURST = float(os.getenv("CLIENT_BURST", 100))
+MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", 200))
+LATENCY_TARGET = float(os.getenv("ADMISSION_LATENCY_TARGET_SECONDS", 1.0))
+
+MAX_TRACKED_CLIENTS = 10000
+# Without completions the latency signal fades, so shedding cannot latch on
+LATENCY_HALF_LIFE = 5.0
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def retry_after(self) -> float:
+        return (1 - self.tokens) / self.rate if self.rate else 1.0
+
+
+class AdmissionController:
+    """Per-client and per-route token buckets plus priority-based load shedding."""
+
+    def __init__(self, priorities: Dict[str, str] = ROUTE_PRIORITIES,
+                 route_limits: Dict[str, float] = ROUTE_RATE_LIMITS,
+                 client_rate: float = CLIENT_RATE_LIMIT, client_burst: float = CLIENT_BURST,
+                 max_inflight: int = MAX_INFLIGHT, latency_target: float = LATENCY_TARGET):
+        self.priorities = priorities
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_inflight = max_inflight
+        self.latency_target = latency_target
+
+        self.client_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.route_buckets = {route: TokenBucket(rate, rate) for route, rate in route_limits.items()}
+        self.inflight = 0
+        self.latency_ewma = 0.0
+        self.latency_updated = time.monotonic()
+
+    def priority(self, route: str, requested: Optional[str] = None) -> str:
+        priority = self.priorities.get(route, "normal")
+        priority = priority if priority in PRIORITIES else "normal"
+        # Callers may ask to be treated as less important than the route, never more
+        if requested in PRIORITIES and PRIORITIES[requested] > PRIORITIES[priority]:
+            return requested
+        return priority
+
+    def _client_bucket(self, client: str) -> TokenBucket:
+        bucket = self.client_buckets.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.client_rate, self.client_burst)
+            self.client_buckets[client] = bucket
+            if len(self.client_buckets) > MAX_TRACKED_CLIENTS:
+                self.client_buckets.popitem(last=False)
+        else:
+            self.client_buckets.move_to_end(client)
+        return bucket
+
+    def current_latency(self) -> float:
+        idle = time.monotonic() - self.latency_updated
+        return self.latency_ewma * 0.5 ** (idle / LATENCY_HALF_LIFE)
+
+    def overloaded(self, priority: str) -> bool:
+        if self.inflight >= self.max_inflight * INFLIGHT_SHED_FRACTION[priority]:
+            return True
+        factor = LATENCY_SHED_FACTOR[priority]
+        return factor is not None and self.current_latency() > self.latency_target * factor
+
+    def admit(self, client: str, route: str, requested_priority: Optional[str] = None) -> Optional[Tuple[int, str, float]]:
+        """Returns None to admit, or (status, detail, retry_after) to reject."""
+        priority = self.priority(route, requested_priority)
+
+        # Shed first so rejected load does not also drain the rate limit buckets
+        if self.overloaded(priority):
+            REQUESTS_REJECTED.labels(route=route, reason="overload").inc()
+            return 503, f"Gateway overloaded, shedding {priority} priority traffic", 1.0
+
+        route_bucket = self.route_buckets.get(route)
+        if route_bucket is not None and not route_bucket.take():
+            REQUESTS_REJECTED.labels(route=route, reason="route_rate_limit").inc()
+            return 429, "Route rate limit exceeded", route_bucket.retry_after()
+
+        client_bucket = self._client_bucket(client)
+        if not client_bucket.take():
+            REQUESTS_REJECTED.labels(route=route, reason="client_rate_limit").inc()
+            return 429, "Client rate limit exceeded", client_bucket.retry_after()
+
+        self.inflight += 1
+        INFLIGHT_REQUESTS.set(self.inflight)
+        return None
+
+    def release(self, elapsed: float):
+        self.inflight -= 1
+        INFLIGHT_REQUESTS.set(self.inflight)
+        self.latency_ewma = 0.9 * self.current_latency() + 0.1 * elapsed
+        self.latency_updated = time.monotonic()
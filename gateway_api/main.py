@@ -1,6 +1,15 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+import asyncio
 import httpx
+import math
+import os
 import pybreaker
+import time
+
+from prometheus_client import make_asgi_app
 
 from opentelemetry import trace
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
@@ -9,6 +18,17 @@ from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+from admission import AdmissionController
+from profiling import StageTimingMiddleware, router as profiling_router, stage
+from routing import StaticRoutes
+from runtime_metrics import start_runtime_monitor, stop_runtime_monitor
+from upstream import STREAM_READ_TIMEOUT, UpstreamPolicy
+
 def setup_jaeger():
     resource = Resource(attributes={
         SERVICE_NAME: "gateway_api" 
@@ -27,9 +47,199 @@ app = FastAPI()
 
 FastAPIInstrumentor.instrument_app(app)
 
+metrics_app = make_asgi_app()
+app.mount("/metrics", metrics_app)
+
+# Event-loop lag, threadpool saturation and GC pauses; THREADPOOL_SIZE resizes the pool
+@app.on_event("startup")
+async def start_runtime_metrics():
+    await start_runtime_monitor()
+
+@app.on_event("shutdown")
+async def stop_runtime_metrics():
+    await stop_runtime_monitor()
+
+# Probes, metrics, docs and profiling bypass admission control
+ADMISSION_EXEMPT = {"", "live", "ready", "metrics", "docs", "openapi.json", "debug"}
+ADMISSION = AdmissionController()
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    route = request.url.path.strip("/").split("/", 1)[0]
+    if route in ADMISSION_EXEMPT:
+        return await call_next(request)
+
+    client = request.client.host if request.client else "unknown"
+    rejection = ADMISSION.admit(client, route, request.headers.get("X-Request-Priority"))
+    if rejection is not None:
+        status_code, detail, retry_after = rejection
+        return JSONResponse(
+            status_code=status_code,
+            content={"detail": detail},
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        ADMISSION.release(time.perf_counter() - started)
+        raise
+    # call_next returns once the headers are ready; the slot is held until the body
+    # (possibly a long NDJSON stream) has been sent as well
+    response.body_iterator = release_after_body(response.body_iterator, started)
+    return response
+
+async def release_after_body(body_iterator, started):
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        ADMISSION.release(time.perf_counter() - started)
+
+# Added after the admission middleware so it wraps it and compresses every response
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 500))
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+# Added last so it runs before admission and compression and times only span creation
+app.add_middleware(StageTimingMiddleware)
+app.include_router(profiling_router)
+
 traffic_breaker = pybreaker.CircuitBreaker(fail_max=3, reset_timeout=10)
 
+DOMAIN_SERVICES = {
+    "traffic": "traffic_service",
+    "energy": "energy_service",
+    "water": "water_service",
+    "waste": "waste_service",
+    "security": "security_service",
+    "health": "health_service",
+}
+
+UPSTREAM_SERVICES = list(DOMAIN_SERVICES.values()) + ["analytics_service"]
+
+# One latency/retry policy per upstream and route class: a zone page, a history scan
+# and a status call differ by orders of magnitude and must not share percentiles
+UPSTREAMS = {}
+
+def upstream_policy(service_name, route):
+    policy = UPSTREAMS.get((service_name, route))
+    if policy is None:
+        policy = UPSTREAMS[(service_name, route)] = UpstreamPolicy(f"{service_name}:{route}")
+    return policy
+
+# Fixed-topology routes (ROUTING_MODE=static|hybrid) skip the discovery hop
+ROUTES = StaticRoutes(UPSTREAM_SERVICES)
+
 REGISTRY_URL = "http://service_registry:8000"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Read-only registry replica used when the primary cannot be reached
+REGISTRY_REPLICA_URL = os.getenv("REGISTRY_REPLICA_URL")
+
+async def discover(client, service_name):
+    try:
+        return await client.get(f"{REGISTRY_URL}/discover/{service_name}")
+    except httpx.RequestError:
+        if not REGISTRY_REPLICA_URL:
+            raise
+        return await client.get(f"{REGISTRY_REPLICA_URL}/discover/{service_name}")
+
+async def resolve(client, service_name, label):
+    service_url = ROUTES.lookup(service_name)
+    if service_url:
+        return service_url
+    if not ROUTES.uses_registry:
+        raise HTTPException(status_code=503, detail=f"{label} service has no static route")
+
+    try:
+        registry_response = await discover(client, service_name)
+    except httpx.RequestError:
+        raise HTTPException(status_code=503, detail="Service Registry unavailable")
+    if registry_response.status_code != 200:
+        raise HTTPException(status_code=503, detail=f"{label} service not found")
+    return registry_response.json()["url"]
+
+def upstream_detail(response, label):
+    if response.headers.get("content-type", "").startswith("application/json"):
+        return response.json().get("detail")
+    return f"{label} Service returned an error"
+
+async def forward(service_name, label, path, params=None, route="status"):
+    client = app.state.http_client
+    with stage("resolve"):
+        service_url = await resolve(client, service_name, label)
+
+    try:
+        with stage("upstream"):
+            response = await upstream_policy(service_name, route).get(client, f"{service_url}{path}", params=params)
+    except httpx.RequestError:
+        raise HTTPException(status_code=503, detail=f"{label} Service unreachable")
+
+    if response.status_code >= 400:
+        raise HTTPException(status_code=response.status_code, detail=upstream_detail(response, label))
+    # Relay the upstream body as-is instead of decoding and re-encoding it
+    return Response(content=response.content, media_type="application/json", headers=cursor_headers(response))
+
+def cursor_headers(response):
+    next_cursor = response.headers.get("x-next-cursor")
+    return {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
+def wants_ndjson(request):
+    return request.query_params.get("format") == "ndjson" or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+async def stream(service_name, label, path, params):
+    """Proxies an NDJSON response chunk by chunk without buffering it."""
+    client = app.state.http_client
+    with stage("resolve"):
+        service_url = await resolve(client, service_name, label)
+
+    upstream_request = client.build_request(
+        "GET", f"{service_url}{path}",
+        params=params,
+        headers={"Accept": NDJSON_MEDIA_TYPE},
+        # Fixed per-read timeout: streams are long by design, so they have no latency policy
+        timeout=STREAM_READ_TIMEOUT
+    )
+    try:
+        # Time to the upstream's response headers; the body is streamed afterwards
+        with stage("upstream"):
+            response = await client.send(upstream_request, stream=True)
+    except httpx.RequestError:
+        raise HTTPException(status_code=503, detail=f"{label} Service unreachable")
+
+    if response.status_code >= 400:
+        await response.aread()
+        await response.aclose()
+        raise HTTPException(status_code=response.status_code, detail=upstream_detail(response, label))
+
+    return StreamingResponse(
+        response.aiter_raw(),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers=cursor_headers(response),
+        background=BackgroundTask(response.aclose)
+    )
+
+async def forward_zone(service_name, label, path, request):
+    if wants_ndjson(request):
+        return await stream(service_name, label, path, request.query_params)
+    return await forward(service_name, label, path, params=request.query_params, route="zone")
+
+@app.on_event("startup")
+async def open_http_client():
+    app.state.http_client = httpx.AsyncClient(
+        timeout=5.0,
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+    )
+    app.state.routes_watcher = asyncio.create_task(ROUTES.watch()) if ROUTES.path else None
+
+@app.on_event("shutdown")
+async def close_http_client():
+    if app.state.routes_watcher is not None:
+        app.state.routes_watcher.cancel()
+    await app.state.http_client.aclose()
 
 @traffic_breaker
 async def call_traffic_service(client, url):
@@ -41,208 +251,97 @@ async def call_traffic_service(client, url):
 def read_root():
     return {"service": "API Gateway", "status": "active"}
 
-@app.get("/traffic/status")
-async def get_traffic_status():
-    async with httpx.AsyncClient() as client:
-        try:
-            registry_response = await client.get(f"{REGISTRY_URL}/discover/traffic_service")
-            if registry_response.status_code != 200:
-                raise HTTPException(status_code=503, detail="Traffic service not found in registry")
-            
-            service_url = registry_response.json()["url"]
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Service Registry unavailable")
+@app.get("/live")
+def liveness():
+    return {"status": "alive"}
 
+@app.get("/ready")
+async def readiness():
+    # The gateway can route while either registry answers (discover() falls back to the replica)
+    if not ROUTES.uses_registry:
+        return {"status": "ready", "routing": ROUTES.mode}
+    client = app.state.http_client
+    for registry_url in filter(None, (REGISTRY_URL, REGISTRY_REPLICA_URL)):
         try:
-            response = await call_traffic_service(client, service_url)
-            return response.json()
-            
-        except pybreaker.CircuitBreakerError:
-            raise HTTPException(
-                status_code=503, 
-                detail="Traffic Service is temporarily unavailable (Circuit Open)"
-            )
+            response = await client.get(f"{registry_url}/ready", timeout=1.0)
         except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Traffic Service unreachable")
-        except httpx.HTTPStatusError:
-            raise HTTPException(status_code=500, detail="Traffic Service returned an error")
+            continue
+        if response.status_code == 200:
+            return {"status": "ready", "registry": registry_url}
+    raise HTTPException(status_code=503, detail="Service Registry unavailable")
+
+@app.get("/traffic/status")
+async def get_traffic_status():
+    client = app.state.http_client
+    service_url = await resolve(client, "traffic_service", "Traffic")
+
+    try:
+        response = await call_traffic_service(client, service_url)
+        return response.json()
+
+    except pybreaker.CircuitBreakerError:
+        raise HTTPException(
+            status_code=503,
+            detail="Traffic Service is temporarily unavailable (Circuit Open)"
+        )
+    except httpx.RequestError:
+        raise HTTPException(status_code=503, detail="Traffic Service unreachable")
+    except httpx.HTTPStatusError:
+        raise HTTPException(status_code=500, detail="Traffic Service returned an error")
 
 @app.get("/traffic/zone/{zone_id}")
-async def get_traffic_zone(zone_id: str):
-    async with httpx.AsyncClient() as client:
-        try:
-            registry_response = await client.get(f"{REGISTRY_URL}/discover/traffic_service")
-            if registry_response.status_code != 200:
-                raise HTTPException(status_code=503, detail="Traffic service not found")
-            
-            service_url = registry_response.json()["url"]
-            
-            response = await client.get(f"{service_url}/traffic/zone/{zone_id}", timeout=5.0)
-            return response.json()
-            
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Traffic Service unreachable")
+async def get_traffic_zone(zone_id: str, request: Request):
+    return await forward_zone("traffic_service", "Traffic", f"/traffic/zone/{zone_id}", request)
 
 @app.get("/energy/grid")
 async def get_energy_grid():
-    async with httpx.AsyncClient() as client:
-        try:
-            registry_response = await client.get(f"{REGISTRY_URL}/discover/energy_service")
-            if registry_response.status_code != 200:
-                raise HTTPException(status_code=503, detail="Energy service not found")
-            
-            service_url = registry_response.json()["url"]
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Registry unavailable")
-
-        try:
-            
-            response = await client.get(f"{service_url}/energy/grid", timeout=5.0)
-            return response.json()
-            
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Energy Service unreachable")
+    return await forward("energy_service", "Energy", "/energy/grid")
 
 @app.get("/energy/zone/{zone_id}")
-async def get_energy_zone(zone_id: str):
-    async with httpx.AsyncClient() as client:
-        try:
-            registry_response = await client.get(f"{REGISTRY_URL}/discover/energy_service")
-            if registry_response.status_code != 200:
-                raise HTTPException(status_code=503, detail="Energy service not found")
-            
-            service_url = registry_response.json()["url"]
-            
-            response = await client.get(f"{service_url}/energy/zone/{zone_id}", timeout=5.0)
-            return response.json()
-            
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Energy Service unreachable")
+async def get_energy_zone(zone_id: str, request: Request):
+    return await forward_zone("energy_service", "Energy", f"/energy/zone/{zone_id}", request)
 
 @app.get("/water/status")
 async def get_water_status():
-    async with httpx.AsyncClient() as client:
-        try:
-            registry_response = await client.get(f"{REGISTRY_URL}/discover/water_service")
-            if registry_response.status_code != 200:
-                raise HTTPException(status_code=503, detail="Water service not found")
-            
-            service_url = registry_response.json()["url"]
-            
-            response = await client.get(f"{service_url}/water/status", timeout=5.0)
-            return response.json()
-            
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Water Service unreachable")
-        
+    return await forward("water_service", "Water", "/water/status")
+
 @app.get("/water/zone/{zone_id}")
-async def get_water_zone(zone_id: str):
-    async with httpx.AsyncClient() as client:
-        try:
-            registry_response = await client.get(f"{REGISTRY_URL}/discover/water_service")
-            if registry_response.status_code != 200:
-                raise HTTPException(status_code=503, detail="Water service not found")
-            
-            service_url = registry_response.json()["url"]
-            
-            response = await client.get(f"{service_url}/water/zone/{zone_id}", timeout=5.0)
-            return response.json()
-            
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Water Service unreachable")
+async def get_water_zone(zone_id: str, request: Request):
+    return await forward_zone("water_service", "Water", f"/water/zone/{zone_id}", request)
 
 @app.get("/waste/status")
 async def get_waste_status():
-    async with httpx.AsyncClient() as client:
-        try:
-            registry_response = await client.get(f"{REGISTRY_URL}/discover/waste_service")
-            if registry_response.status_code != 200:
-                raise HTTPException(status_code=503, detail="Waste service not found")
-            
-            service_url = registry_response.json()["url"]
-            
-            response = await client.get(f"{service_url}/waste/status", timeout=5.0)
-            return response.json()
-            
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Waste Service unreachable")
+    return await forward("waste_service", "Waste", "/waste/status")
 
 @app.get("/waste/zone/{zone_id}")
-async def get_waste_zone(zone_id: str):
-    async with httpx.AsyncClient() as client:
-        try:
-            registry_response = await client.get(f"{REGISTRY_URL}/discover/waste_service")
-            if registry_response.status_code != 200:
-                raise HTTPException(status_code=503, detail="Waste service not found")
-            
-            service_url = registry_response.json()["url"]
-            
-            response = await client.get(f"{service_url}/waste/zone/{zone_id}", timeout=5.0)
-            return response.json()
-            
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Waste Service unreachable")
+async def get_waste_zone(zone_id: str, request: Request):
+    return await forward_zone("waste_service", "Waste", f"/waste/zone/{zone_id}", request)
 
 @app.get("/security/status")
 async def get_security_status():
-    async with httpx.AsyncClient() as client:
-        try:
-            registry_response = await client.get(f"{REGISTRY_URL}/discover/security_service")
-            if registry_response.status_code != 200:
-                raise HTTPException(status_code=503, detail="Security service not found")
-            
-            service_url = registry_response.json()["url"]
-            
-            response = await client.get(f"{service_url}/security/status", timeout=5.0)
-            return response.json()
-            
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Security Service unreachable")
+    return await forward("security_service", "Security", "/security/status")
 
 @app.get("/security/zone/{zone_id}")
-async def get_security_zone(zone_id: str):
-    async with httpx.AsyncClient() as client:
-        try:
-            registry_response = await client.get(f"{REGISTRY_URL}/discover/security_service")
-            if registry_response.status_code != 200:
-                raise HTTPException(status_code=503, detail="Security service not found")
-            
-            service_url = registry_response.json()["url"]
-            
-            response = await client.get(f"{service_url}/security/zone/{zone_id}", timeout=5.0)
-            return response.json()
-            
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Security Service unreachable")
+async def get_security_zone(zone_id: str, request: Request):
+    return await forward_zone("security_service", "Security", f"/security/zone/{zone_id}", request)
 
 @app.get("/health/status")
 async def get_health_status():
-    async with httpx.AsyncClient() as client:
-        try:
-            registry_response = await client.get(f"{REGISTRY_URL}/discover/health_service")
-            if registry_response.status_code != 200:
-                raise HTTPException(status_code=503, detail="Health service not found")
-            
-            service_url = registry_response.json()["url"]
-            
-            response = await client.get(f"{service_url}/health/status", timeout=5.0)
-            return response.json()
-            
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Health Service unreachable")
-        
+    return await forward("health_service", "Health", "/health/status")
+
 @app.get("/health/zone/{zone_id}")
-async def get_health_zone(zone_id: str):
-    async with httpx.AsyncClient() as client:
-        try:
-            registry_response = await client.get(f"{REGISTRY_URL}/discover/health_service")
-            if registry_response.status_code != 200:
-                raise HTTPException(status_code=503, detail="Health service not found")
-            
-            service_url = registry_response.json()["url"]
-            
-            response = await client.get(f"{service_url}/health/zone/{zone_id}", timeout=5.0)
-            return response.json()
-            
-        except httpx.RequestError:
-            raise HTTPException(status_code=503, detail="Health Service unreachable")
\ No newline at end of file
+async def get_health_zone(zone_id: str, request: Request):
+    return await forward_zone("health_service", "Health", f"/health/zone/{zone_id}", request)
+
+@app.get("/analytics/{path:path}")
+async def get_analytics(path: str, request: Request):
+    return await forward("analytics_service", "Analytics", f"/analytics/{path}", params=request.query_params,
+                         route="analytics")
+
+@app.get("/{domain}/history/{zone_id}")
+async def get_domain_history(domain: str, zone_id: str, request: Request):
+    service_name = DOMAIN_SERVICES.get(domain)
+    if service_name is None:
+        raise HTTPException(status_code=404, detail="Unknown domain")
+    return await forward(service_name, domain.capitalize(), f"/{domain}/history/{zone_id}",
+                         params=request.query_params, route="history")
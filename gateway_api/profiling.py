@@ -0,0 +1,162 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter as Tally
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from opentelemetry import trace
+from prometheus_client import Histogram
+
+# Sub-millisecond buckets: stages are much shorter than whole requests
+STAGE_LATENCY = Histogram(
+    'app_stage_seconds', 'Time spent in each stage of request handling', ['stage'],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+# The profiler is off unless explicitly enabled, and even then needs ADMIN_TOKEN
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 60))
+
+SCOPE_KEY = "stage_timing"
+
+
+def stage(name: str):
+    """Context manager that records the enclosed block under ``name``."""
+    return STAGE_LATENCY.labels(stage=name).time()
+
+
+def record_queue_wait(request: Request):
+    """Called first thing in a sync handler: time since QueueStampMiddleware ran.
+
+    Covers routing and, above all, the wait for a threadpool worker.
+    """
+    timing = request.scope.get(SCOPE_KEY)
+    if timing is not None:
+        STAGE_LATENCY.labels(stage="threadpool_wait").observe(time.perf_counter() - timing["start"])
+
+
+class QueueStampMiddleware:
+    """Stamps each request for record_queue_wait.
+
+    Added first so it is the innermost middleware: fault injection and other
+    middleware delays are not counted as threadpool wait.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope[SCOPE_KEY] = {"start": time.perf_counter()}
+        await self.app(scope, receive, send)
+
+
+class StageTimingMiddleware:
+    """Times span creation as the "tracing" stage.
+
+    FastAPIInstrumentor always wraps the whole middleware stack, so by the
+    time this runs the server span has started; the gap since its start is
+    the cost of tracing.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            span_start = getattr(trace.get_current_span(), "start_time", None)
+            if span_start:
+                STAGE_LATENCY.labels(stage="tracing").observe(max(0, time.time_ns() - span_start) / 1e9)
+        await self.app(scope, receive, send)
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread at a fixed interval.
+
+    Runs in its own thread so it sees the event loop and the threadpool
+    workers alike; stacks are aggregated in collapsed (flamegraph) form.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Tally()
+        self.samples = 0
+
+    def run(self, seconds: float):
+        me = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                self.stacks[self.collapse(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    @staticmethod
+    def collapse(thread_name: str, frame) -> str:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        return ";".join(reversed(frames))
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top: int) -> dict:
+        leaves = Tally()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return {
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "top_functions": [{"frame": frame, "samples": count} for frame, count in leaves.most_common(top)],
+            "top_stacks": [{"stack": stack, "samples": count} for stack, count in self.stacks.most_common(top)],
+        }
+
+
+PROFILE_STATE = {"running": False}
+
+router = APIRouter(prefix="/debug")
+
+
+@router.get("/profile")
+async def profile(seconds: float = Query(5, gt=0), interval_ms: float = Query(5, ge=1, le=1000),
+                  format: str = Query("collapsed", pattern="^(collapsed|json)$"), top: int = Query(30, ge=1),
+                  x_admin_token: Optional[str] = Header(None)):
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    # Stack samples expose internals, so the profiler is never served unauthenticated
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiling requires ADMIN_TOKEN to be set")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if PROFILE_STATE["running"]:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    PROFILE_STATE["running"] = True
+    try:
+        profiler = SamplingProfiler(interval_ms / 1000)
+        # A dedicated thread rather than the request threadpool, which is what is being measured
+        thread = threading.Thread(target=profiler.run, args=(min(seconds, PROFILE_MAX_SECONDS),),
+                                  name="profiler", daemon=True)
+        thread.start()
+        while thread.is_alive():
+            await asyncio.sleep(0.05)
+    finally:
+        PROFILE_STATE["running"] = False
+
+    if format == "json":
+        return profiler.summary(top)
+    return PlainTextResponse(profiler.collapsed())
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+from typing import Dict, Iterable, Optional
+
+from prometheus_client import Counter
+
+ROUTE_RELOADS = Counter('gateway_route_reloads_total', 'Static route file reloads', ['result'])
+
+ROUTING_MODES = ("registry", "static", "hybrid")
+
+# registry: always discover; static: only env/file routes; hybrid: static first, registry as fallback
+ROUTING_MODE = os.getenv("ROUTING_MODE", "registry")
+ROUTES_FILE = os.getenv("ROUTES_FILE")
+ROUTES_RELOAD_INTERVAL = float(os.getenv("ROUTES_RELOAD_INTERVAL_SECONDS", 5))
+
+
+def env_routes(service_names: Iterable[str]) -> Dict[str, str]:
+    """traffic_service is routed to TRAFFIC_SERVICE_URL when that variable is set."""
+    routes = {}
+    for service_name in service_names:
+        url = os.getenv(f"{service_name.upper()}_URL")
+        if url:
+            routes[service_name] = url.rstrip("/")
+    return routes
+
+
+def read_routes_file(path: str) -> Dict[str, str]:
+    """The file is a JSON object mapping service names to base URLs."""
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not all(isinstance(url, str) for url in data.values()):
+        raise ValueError("Routes file must map service names to URLs")
+    return {service_name: url.rstrip("/") for service_name, url in data.items()}
+
+
+class StaticRoutes:
+    """Upstream URLs from env vars, overridden by an optional watched JSON file.
+
+    A reload builds a complete new table and swaps it in with a single
+    assignment, so lookups never see a half-applied file. A file that fails
+    to parse keeps the previous table.
+    """
+
+    def __init__(self, service_names: Iterable[str], mode: str = ROUTING_MODE,
+                 path: Optional[str] = ROUTES_FILE):
+        if mode not in ROUTING_MODES:
+            raise ValueError(f"ROUTING_MODE must be one of {ROUTING_MODES}")
+        self.mode = mode
+        self.path = path
+        self.env = env_routes(service_names)
+        self.routes = dict(self.env)
+        self.mtime = None
+        if path:
+            self.reload()
+
+    @property
+    def uses_registry(self) -> bool:
+        return self.mode != "static"
+
+    def lookup(self, service_name: str) -> Optional[str]:
+        if self.mode == "registry":
+            return None
+        return self.routes.get(service_name)
+
+    def reload(self) -> bool:
+        """Re-reads the routes file if it changed; returns True when a new table was applied."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            if self.mtime is not None:
+                print(f"Routes file {self.path} removed, falling back to env routes")
+                self.routes = dict(self.env)
+                self.mtime = None
+                ROUTE_RELOADS.labels(result="removed").inc()
+                return True
+            return False
+
+        if mtime == self.mtime:
+            return False
+        try:
+            routes = {**self.env, **read_routes_file(self.path)}
+        except (OSError, ValueError) as e:
+            print(f"Ignoring invalid routes file {self.path}: {e}")
+            self.mtime = mtime
+            ROUTE_RELOADS.labels(result="error").inc()
+            return False
+
+        self.routes = routes
+        self.mtime = mtime
+        print(f"Loaded {len(routes)} static routes from {self.path}")
+        ROUTE_RELOADS.labels(result="ok").inc()
+        return True
+
+    async def watch(self, interval: float = ROUTES_RELOAD_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            self.reload()
@@ -0,0 +1,59 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import AdmissionController
+
+PRIORITIES = {"health": "critical", "traffic": "normal", "waste": "low"}
+
+def make_controller(**kwargs):
+    options = dict(priorities=PRIORITIES, route_limits={}, client_rate=1000, client_burst=1000,
+                   max_inflight=10, latency_target=1.0)
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+def test_client_rate_limit_returns_429():
+    controller = make_controller(client_rate=1, client_burst=2)
+    assert controller.admit("1.2.3.4", "traffic") is None
+    assert controller.admit("1.2.3.4", "traffic") is None
+    assert controller.admit("1.2.3.4", "traffic")[0] == 429
+    # Other clients have their own bucket
+    assert controller.admit("5.6.7.8", "traffic") is None
+
+def test_route_rate_limit_returns_429():
+    controller = make_controller(route_limits={"waste": 1})
+    assert controller.admit("a", "waste") is None
+    assert controller.admit("b", "waste")[0] == 429
+    assert controller.admit("c", "health") is None
+
+# Low priority routes are shed first as in-flight requests pile up
+def test_overload_sheds_by_priority():
+    controller = make_controller()
+    for _ in range(5):
+        assert controller.admit("a", "health") is None
+
+    assert controller.admit("a", "waste")[0] == 503
+    assert controller.admit("a", "traffic") is None
+    assert controller.admit("a", "health") is None
+
+def test_slow_responses_shed_low_priority():
+    controller = make_controller()
+    for _ in range(20):
+        assert controller.admit("a", "health") is None
+        controller.release(5.0)
+
+    assert controller.admit("a", "waste")[0] == 503
+    assert controller.admit("a", "health") is None
+
+# A caller can lower its priority below the route's, but never raise it
+def test_requested_priority_only_lowers():
+    controller = make_controller()
+    assert controller.priority("health", "low") == "low"
+    assert controller.priority("waste", "critical") == "low"
+    assert controller.priority("traffic", "bogus") == "normal"
+
+    for _ in range(5):
+        assert controller.admit("a", "health") is None
+    assert controller.admit("analytics", "health", "low")[0] == 503
+    assert controller.admit("a", "health") is None
@@ -0,0 +1,40 @@
+import sys
+import os
+import json
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routing import StaticRoutes
+
+def write_routes(path, routes, mtime):
+    with open(path, "w") as f:
+        json.dump(routes, f)
+    # Explicit mtimes so consecutive writes are always seen as changes
+    os.utime(path, ns=(mtime, mtime))
+
+def test_env_routes_are_ignored_in_registry_mode(monkeypatch):
+    monkeypatch.setenv("TRAFFIC_SERVICE_URL", "http://traffic:8000/")
+    assert StaticRoutes(["traffic_service"], mode="registry", path=None).lookup("traffic_service") is None
+
+    routes = StaticRoutes(["traffic_service", "energy_service"], mode="hybrid", path=None)
+    assert routes.lookup("traffic_service") == "http://traffic:8000"
+    assert routes.lookup("energy_service") is None
+
+def test_routes_file_reloads_and_keeps_last_good_table(monkeypatch):
+    monkeypatch.delenv("TRAFFIC_SERVICE_URL", raising=False)
+    path = os.path.join(tempfile.mkdtemp(), "routes.json")
+    write_routes(path, {"traffic_service": "http://a:8000"}, 1_000_000_000)
+
+    routes = StaticRoutes(["traffic_service"], mode="static", path=path)
+    assert routes.lookup("traffic_service") == "http://a:8000"
+
+    write_routes(path, {"traffic_service": "http://b:8000"}, 2_000_000_000)
+    assert routes.reload()
+    assert routes.lookup("traffic_service") == "http://b:8000"
+
+    with open(path, "w") as f:
+        f.write("{not json")
+    os.utime(path, ns=(3_000_000_000, 3_000_000_000))
+    assert not routes.reload()
+    assert routes.lookup("traffic_service") == "http://b:8000"
@@ -0,0 +1,93 @@
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from upstream import UpstreamPolicy, RetryBudget, MAX_TIMEOUT, MIN_SAMPLES
+
+def make_client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+def warm_up(policy, seconds, count=MIN_SAMPLES):
+    for _ in range(count):
+        policy.latency.observe(seconds)
+
+# Without latency history the timeout falls back to the configured maximum
+def test_timeout_adapts_to_observed_latency():
+    policy = UpstreamPolicy("test")
+    assert policy.timeout() == MAX_TIMEOUT
+
+    warm_up(policy, 0.1)
+    assert policy.timeout() < MAX_TIMEOUT
+
+def test_retry_budget_caps_extra_attempts():
+    budget = RetryBudget(ratio=0.1, reserve=2)
+    for _ in range(10):
+        budget.record_request()
+
+    spent = sum(budget.try_spend() for _ in range(10))
+    assert spent == 3
+
+# A failed attempt is retried once
+def test_retries_server_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503 if len(calls) == 1 else 200, json={"ok": True})
+
+    async def run():
+        async with make_client(handler) as client:
+            return await UpstreamPolicy("test", hedging=False).get(client, "http://upstream/x")
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert len(calls) == 2
+
+# A slow first attempt is overtaken by the hedge
+def test_hedge_returns_faster_attempt():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(1.0)
+            return httpx.Response(200, json={"attempt": "primary"})
+        return httpx.Response(200, json={"attempt": "hedge"})
+
+    async def run():
+        policy = UpstreamPolicy("test", hedging=True)
+        warm_up(policy, 0.01)
+        async with make_client(handler) as client:
+            return await policy.get(client, "http://upstream/x")
+
+    response = asyncio.run(run())
+    assert response.json() == {"attempt": "hedge"}
+    assert len(calls) == 2
+
+# The cancelled slow primary still counts, so hedging does not drag p95 down
+def test_hedged_slow_primary_does_not_lower_p95():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(1.0)
+        return httpx.Response(200, json={})
+
+    policy = UpstreamPolicy("test", hedging=True)
+    warm_up(policy, 0.01, count=MIN_SAMPLES - 1)
+    policy.latency.observe(0.05)
+    p95 = policy.latency.percentile(0.95)
+
+    async def run():
+        async with make_client(handler) as client:
+            await policy.get(client, "http://upstream/x")
+        # Let the cancelled primary record its sample
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    assert policy.latency.percentile(0.95) >= p95
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Optional
+
+import httpx
+from prometheus_client import Counter, Gauge
+
+UPSTREAM_ATTEMPTS = Counter(
+    'gateway_upstream_attempts_total', 'Upstream attempts by kind', ['upstream', 'kind']
+)
+UPSTREAM_TIMEOUT = Gauge(
+    'gateway_upstream_timeout_seconds', 'Current adaptive upstream timeout', ['upstream']
+)
+
+HEDGING_ENABLED = os.getenv("UPSTREAM_HEDGING", "true").lower() == "true"
+MIN_TIMEOUT = float(os.getenv("UPSTREAM_MIN_TIMEOUT_SECONDS", 0.25))
+MAX_TIMEOUT = float(os.getenv("UPSTREAM_MAX_TIMEOUT_SECONDS", 5.0))
+TIMEOUT_MULTIPLIER = float(os.getenv("UPSTREAM_TIMEOUT_MULTIPLIER", 3.0))
+RETRY_BUDGET_RATIO = float(os.getenv("UPSTREAM_RETRY_BUDGET_RATIO", 0.1))
+MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", 1))
+# Per-read timeout for proxied NDJSON streams
+STREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_STREAM_TIMEOUT_SECONDS", 10.0))
+
+# Below this many samples the percentiles are too noisy to act on
+MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """Sliding window of recent upstream latencies."""
+
+    def __init__(self, window: int = 500):
+        self.samples = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RetryBudget:
+    """Allows extra attempts (retries and hedges) up to a fraction of recent requests.
+
+    A small per-window reserve keeps low-traffic upstreams retryable; beyond
+    that, extra attempts can never exceed ``ratio`` of the traffic, so a
+    failing upstream sees at most (1 + ratio) times its normal load.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, window: float = 10.0, reserve: int = 3):
+        self.ratio = ratio
+        self.window = window
+        self.reserve = reserve
+        self.requests = deque()
+        self.spent = deque()
+
+    def _trim(self, now: float):
+        for events in (self.requests, self.spent):
+            while events and events[0] < now - self.window:
+                events.popleft()
+
+    def record_request(self):
+        now = time.monotonic()
+        self._trim(now)
+        self.requests.append(now)
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self._trim(now)
+        if len(self.spent) >= self.reserve + self.ratio * len(self.requests):
+            return False
+        self.spent.append(now)
+        return True
+
+
+def is_retriable(result) -> bool:
+    if isinstance(result, BaseException):
+        return isinstance(result, httpx.RequestError)
+    return result.status_code >= 500
+
+
+class UpstreamPolicy:
+    """Adaptive timeout, hedging and budgeted retries for one upstream service."""
+
+    def __init__(self, name: str, hedging: bool = HEDGING_ENABLED):
+        self.name = name
+        self.hedging = hedging
+        self.latency = LatencyTracker()
+        self.budget = RetryBudget()
+
+    def timeout(self) -> float:
+        p99 = self.latency.percentile(0.99)
+        if p99 is None:
+            return MAX_TIMEOUT
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, p99 * TIMEOUT_MULTIPLIER))
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedging:
+            return None
+        return self.latency.percentile(0.95)
+
+    async def _attempt(self, client: httpx.AsyncClient, url: str, params, timeout: float, kind: str):
+        UPSTREAM_ATTEMPTS.labels(upstream=self.name, kind=kind).inc()
+        started = time.perf_counter()
+        try:
+            response = await client.get(url, params=params, timeout=timeout)
+        except httpx.TimeoutException:
+            self.latency.observe(timeout)
+            raise
+        except asyncio.CancelledError:
+            # The loser of a hedge: its elapsed time is a lower bound on its latency, and
+            # dropping it would skew the window fast and pull p95/p99 down under tail latency
+            self.latency.observe(time.perf_counter() - started)
+            raise
+        self.latency.observe(time.perf_counter() - started)
+        return response
+
+    async def get(self, client: httpx.AsyncClient, url: str, params=None) -> httpx.Response:
+        self.budget.record_request()
+        timeout = self.timeout()
+        UPSTREAM_TIMEOUT.labels(upstream=self.name).set(timeout)
+
+        def launch(kind: str):
+            task = asyncio.create_task(self._attempt(client, url, params, timeout, kind))
+            attempts.append(task)
+            return task
+
+        attempts = []
+        pending = {launch("primary")}
+        retries = 0
+        last_result = None
+        try:
+            hedge_delay = self.hedge_delay()
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+                if not done and self.budget.try_spend():
+                    pending.add(launch("hedge"))
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    last_result = task.exception() or task.result()
+                    if not is_retriable(last_result):
+                        break
+                else:
+                    if not pending and retries < MAX_RETRIES and self.budget.try_spend():
+                        retries += 1
+                        pending.add(launch("retry"))
+                    continue
+                break
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+
+        if isinstance(last_result, BaseException):
+            raise last_result
+        return last_result
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import random
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter
+from pydantic import BaseModel, Field
+
+FAULTS_INJECTED = Counter('fault_injections_total', 'Injected faults', ['kind'])
+
+# The /admin endpoints only exist when explicitly enabled, since ports are published
+ADMIN_ENABLED = os.getenv("FAULTS_ADMIN_ENABLED", "false").lower() in ("1", "true", "yes")
+# Protects the /admin endpoints when set; requests must send X-Admin-Token
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# A fixed seed makes a benchmark run replay the same sequence of faults
+RNG = random.Random(os.getenv("FAULT_SEED"))
+
+
+class FaultProfile(BaseModel):
+    latency_ms: float = Field(0, ge=0)
+    latency_jitter_ms: float = Field(0, ge=0)
+    latency_distribution: str = Field("fixed", pattern="^(fixed|uniform|exponential)$")
+    latency_rate: float = Field(1.0, ge=0, le=1)
+    error_rate: float = Field(0, ge=0, le=1)
+    error_status: int = Field(500, ge=400, le=599)
+    reset_rate: float = Field(0, ge=0, le=1)
+    drip_rate: float = Field(0, ge=0, le=1)
+    drip_chunk_bytes: int = Field(64, ge=1)
+    drip_interval_ms: float = Field(50, ge=0)
+
+
+PRESETS = {
+    "none": FaultProfile(),
+    "slow": FaultProfile(latency_ms=300, latency_distribution="exponential"),
+    "slow_tail": FaultProfile(latency_ms=1500, latency_rate=0.05),
+    "flaky": FaultProfile(error_rate=0.2),
+    "outage": FaultProfile(error_rate=1.0, error_status=503),
+    "resets": FaultProfile(reset_rate=0.1),
+    "drip": FaultProfile(drip_rate=1.0, drip_chunk_bytes=32, drip_interval_ms=100),
+}
+
+
+def profile_from_env() -> FaultProfile:
+    """FAULT_PROFILE is either a preset name or a JSON profile."""
+    raw = os.getenv("FAULT_PROFILE", "none").strip()
+    if raw in PRESETS:
+        return PRESETS[raw]
+    return FaultProfile(**json.loads(raw))
+
+
+def profile_name_from_env() -> str:
+    raw = os.getenv("FAULT_PROFILE", "none").strip()
+    return raw if raw in PRESETS else "custom"
+
+
+STATE = {"profile": profile_from_env(), "name": profile_name_from_env()}
+
+
+def sample_latency(profile: FaultProfile) -> float:
+    if profile.latency_ms <= 0 or RNG.random() >= profile.latency_rate:
+        return 0.0
+    if profile.latency_distribution == "uniform":
+        delay_ms = profile.latency_ms + RNG.uniform(0, profile.latency_jitter_ms)
+    elif profile.latency_distribution == "exponential":
+        delay_ms = RNG.expovariate(1 / profile.latency_ms)
+    else:
+        delay_ms = profile.latency_ms
+    return delay_ms / 1000
+
+
+class FaultInjectionMiddleware:
+    """Applies the active fault profile to requests under ``prefix``."""
+
+    def __init__(self, app, prefix: str):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        profile = STATE["profile"]
+
+        delay = sample_latency(profile)
+        if delay:
+            FAULTS_INJECTED.labels(kind="latency").inc()
+            await asyncio.sleep(delay)
+
+        if RNG.random() < profile.error_rate:
+            FAULTS_INJECTED.labels(kind="error").inc()
+            response = JSONResponse({"detail": "Injected fault"}, status_code=profile.error_status)
+            await response(scope, receive, send)
+            return
+
+        if RNG.random() < profile.reset_rate:
+            FAULTS_INJECTED.labels(kind="reset").inc()
+            # Promise a body and drop the connection before sending it
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", b"1024")]
+            })
+            raise ConnectionResetError("Injected connection reset")
+
+        if RNG.random() < profile.drip_rate:
+            FAULTS_INJECTED.labels(kind="drip").inc()
+            await self.app(scope, receive, self._dripping(send, profile))
+            return
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _dripping(send, profile: FaultProfile):
+        interval = profile.drip_interval_ms / 1000
+        size = profile.drip_chunk_bytes
+
+        async def drip_send(message):
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            chunks = [body[i:i + size] for i in range(0, len(body), size)] or [b""]
+            for i, chunk in enumerate(chunks):
+                last = i == len(chunks) - 1
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body or not last})
+                if not last:
+                    await asyncio.sleep(interval)
+
+        return drip_send
+
+
+def check_admin_token(token: Optional[str]):
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=404, detail="Fault admin is disabled")
+    if ADMIN_TOKEN and token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin/faults")
+
+
+@router.get("")
+def get_fault_profile(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    return {"name": STATE["name"], "profile": STATE["profile"], "presets": sorted(PRESETS)}
+
+
+@router.put("")
+def set_fault_profile(profile: FaultProfile, x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    STATE["profile"] = profile
+    STATE["name"] = "custom"
+    return {"name": STATE["name"], "profile": profile}
+
+
+@router.post("/preset/{name}")
+def set_fault_preset(name: str, x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    if name not in PRESETS:
+        raise HTTPException(status_code=404, detail=f"Unknown preset, expected one of {sorted(PRESETS)}")
+    STATE["profile"] = PRESETS[name]
+    STATE["name"] = name
+    return {"name": name, "profile": STATE["profile"]}
+
+
+@router.delete("")
+def clear_fault_profile(x_admin_token: Optional[str] = Header(None)):
+    check_admin_token(x_admin_token)
+    STATE["profile"] = PRESETS["none"]
+    STATE["name"] = "none"
+    return {"name": "none", "profile": STATE["profile"]}
@@ -1,9 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import os
 import random
+import time
 from datetime import datetime
 import httpx
 import asyncio
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from prometheus_client import make_asgi_app, Counter, Histogram
 from opentelemetry import trace
@@ -13,12 +16,33 @@ from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
+from faults import FaultInjectionMiddleware, router as faults_router
+from profiling import QueueStampMiddleware, StageTimingMiddleware, record_queue_wait, router as profiling_router, stage
+from streaming import (
+    MAX_PAGE_SIZE, NDJSON_MEDIA_TYPE, STREAM_BATCH_SIZE,
+    ndjson_lines, page_bounds, sensor_range, wants_ndjson, zone_sensor_counts
+)
+from timeseries import MAX_TIMESTAMP, TimeSeriesStore
+from runtime_metrics import start_runtime_monitor, stop_runtime_monitor
+
 MY_SERVICE_NAME = "health_service"
 SERVICE_URL = "http://health_service:8000"
-REGISTRY_URL = "http://service_registry:8000/register"
+REGISTRY_URL = "http://service_registry:8000"
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL_SECONDS", 10))
+REGISTRATION_MAX_BACKOFF = 30.0
 
 ZONE_CONFIG: Dict[str, int] = {}
 
+ZONE_SENSOR_COUNTS = zone_sensor_counts()
+SENSOR_RANGE = sensor_range((1, 2))
+
+TRACKED_METRICS = ["icu_occupancy_percent", "available_ambulances"]
+STORE = TimeSeriesStore(os.getenv("TSDB_PATH", "readings.db"))
+
+SENSOR_FIELDS = ["id", "zone", "timestamp", "icu_occupancy_percent", "available_ambulances", "status"]
+
+SERVICE_STATE = {"ready": False, "registered": False, "registration_task": None}
+
 def setup_jaeger():
     resource = Resource(attributes={SERVICE_NAME: MY_SERVICE_NAME})
     provider = TracerProvider(resource=resource)
@@ -30,58 +54,178 @@ setup_jaeger()
 
 app = FastAPI()
 FastAPIInstrumentor.instrument_app(app)
+# Innermost, so threadpool_wait starts after fault injection
+app.add_middleware(QueueStampMiddleware)
+app.add_middleware(FaultInjectionMiddleware, prefix="/health/")
+app.include_router(faults_router)
+# Added last so it runs before fault injection and times only span creation
+app.add_middleware(StageTimingMiddleware)
+app.include_router(profiling_router)
 
 REQUEST_COUNT = Counter('app_request_count', 'Request Count', ['method', 'endpoint', 'http_status'])
 REQUEST_LATENCY = Histogram('app_request_latency_seconds', 'Request Latency', ['method', 'endpoint'])
 metrics_app = make_asgi_app()
 app.mount("/metrics", metrics_app)
 
+# Event-loop lag, threadpool saturation and GC pauses; THREADPOOL_SIZE resizes the pool
 @app.on_event("startup")
-async def register_with_registry():
-    async with httpx.AsyncClient() as client:
-        for attempt in range(5):
+async def start_runtime_metrics():
+    await start_runtime_monitor()
+
+@app.on_event("shutdown")
+async def stop_runtime_metrics():
+    await stop_runtime_monitor()
+
+async def registration_loop():
+    # Registers and then keeps heartbeating; failures back off exponentially with full jitter
+    backoff = 0.5
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while True:
             try:
-                await client.post(REGISTRY_URL, json={"name": MY_SERVICE_NAME, "url": SERVICE_URL})
-                print(f"Registered {MY_SERVICE_NAME}")
-                break
-            except Exception:
-                await asyncio.sleep(2)
+                response = await client.post(f"{REGISTRY_URL}/register", json={
+                    "name": MY_SERVICE_NAME,
+                    "url": SERVICE_URL,
+                    "ready": SERVICE_STATE["ready"]
+                })
+                response.raise_for_status()
+                if not SERVICE_STATE["registered"]:
+                    print(f"Registered {MY_SERVICE_NAME}")
+                SERVICE_STATE["registered"] = True
+                backoff = 0.5
+                await asyncio.sleep(HEARTBEAT_INTERVAL)
+            except httpx.HTTPError:
+                SERVICE_STATE["registered"] = False
+                await asyncio.sleep(random.uniform(0, backoff))
+                backoff = min(backoff * 2, REGISTRATION_MAX_BACKOFF)
+
+@app.on_event("startup")
+def start_store():
+    STORE.start()
+    SERVICE_STATE["ready"] = True
+
+@app.on_event("startup")
+async def register_with_registry():
+    SERVICE_STATE["registration_task"] = asyncio.create_task(registration_loop())
+
+@app.on_event("shutdown")
+async def deregister_from_registry():
+    SERVICE_STATE["ready"] = False
+    task = SERVICE_STATE["registration_task"]
+    if task is not None:
+        task.cancel()
+    async with httpx.AsyncClient(timeout=1.0) as client:
+        try:
+            await client.post(f"{REGISTRY_URL}/register", json={"name": MY_SERVICE_NAME, "url": SERVICE_URL, "ready": False})
+        except httpx.HTTPError:
+            pass
+
+@app.on_event("shutdown")
+def stop_store():
+    STORE.stop()
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    wanted = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in wanted if field not in SENSOR_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}, expected any of {SENSOR_FIELDS}")
+    return wanted
+
+def project_fields(sensors: List[dict], wanted: Optional[List[str]]) -> List[dict]:
+    if wanted is None:
+        return sensors
+    return [{field: sensor[field] for field in wanted} for sensor in sensors]
+
+@app.get("/live")
+def liveness():
+    return {"status": "alive"}
+
+@app.get("/ready")
+def readiness():
+    if not SERVICE_STATE["ready"]:
+        raise HTTPException(status_code=503, detail="Service not ready")
+    return {"status": "ready", "registered": SERVICE_STATE["registered"]}
 
 @app.get("/")
 def read_root():
     return {"service": "Smart Health System", "status": "active"}
 
+def sensor_count(zone_id: str) -> int:
+    if zone_id not in ZONE_CONFIG:
+        ZONE_CONFIG[zone_id] = ZONE_SENSOR_COUNTS.get(zone_id) or random.randint(*SENSOR_RANGE)
+        print(f"DEBUG: Configured Health Zone {zone_id} with {ZONE_CONFIG[zone_id]} units.")
+    return ZONE_CONFIG[zone_id]
+
+def build_sensor(zone_id: str, i: int) -> dict:
+    unit_id = f"HOSP-{zone_id}-0{i}"
+
+    icu_occupancy = random.randint(30, 100)
+    ambulances = random.randint(0, 8)
+
+    status = "OPERATIONAL"
+    if icu_occupancy > 95:
+        status = "CRITICAL_BED_SHORTAGE"
+    elif ambulances == 0:
+        status = "WARNING_NO_AMBULANCES"
+
+    return {
+        "id": unit_id,
+        "zone": zone_id,
+        "timestamp": datetime.utcnow().isoformat(),
+        "icu_occupancy_percent": icu_occupancy,
+        "available_ambulances": ambulances,
+        "status": status
+    }
+
+def sensor_batches(zone_id: str, start: int, stop: int, wanted: Optional[List[str]]):
+    # Generated, recorded and projected a batch at a time so memory stays flat for huge zones
+    for batch_start in range(start, stop, STREAM_BATCH_SIZE):
+        batch_stop = min(stop, batch_start + STREAM_BATCH_SIZE)
+        with stage("generate"):
+            batch = [build_sensor(zone_id, i) for i in range(batch_start, batch_stop)]
+        with stage("record"):
+            STORE.record(zone_id, batch, TRACKED_METRICS)
+        with stage("project"):
+            batch = project_fields(batch, wanted)
+        yield batch
+
 @app.get("/health/zone/{zone_id}")
-def get_health_by_zone(zone_id: str):
+def get_health_by_zone(zone_id: str, request: Request, fields: Optional[str] = None,
+                       limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                       cursor: Optional[str] = None, format: Optional[str] = None):
+    record_queue_wait(request)
+    wanted = parse_fields(fields)
+
     with REQUEST_LATENCY.labels(method="GET", endpoint="/health/zone").time():
-        
-        if zone_id not in ZONE_CONFIG:
-            ZONE_CONFIG[zone_id] = random.randint(1, 2)
-            print(f"DEBUG: Configured Health Zone {zone_id} with {ZONE_CONFIG[zone_id]} units.")
-
-        num_units = ZONE_CONFIG[zone_id]
-        sensors_data = []
-
-        for i in range(1, num_units + 1):
-            unit_id = f"HOSP-{zone_id}-0{i}"
-            
-            icu_occupancy = random.randint(30, 100)
-            ambulances = random.randint(0, 8)
-            
-            status = "OPERATIONAL"
-            if icu_occupancy > 95:
-                status = "CRITICAL_BED_SHORTAGE"
-            elif ambulances == 0:
-                status = "WARNING_NO_AMBULANCES"
-
-            sensors_data.append({
-                "id": unit_id,
-                "zone": zone_id,
-                "timestamp": datetime.utcnow().isoformat(),
-                "icu_occupancy_percent": icu_occupancy,
-                "available_ambulances": ambulances,
-                "status": status
-            })
+        num_sensors = sensor_count(zone_id)
+        start, stop, next_cursor = page_bounds(zone_id, num_sensors, cursor, limit)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
 
         REQUEST_COUNT.labels(method="GET", endpoint="/health/zone", http_status=200).inc()
-        return sensors_data
\ No newline at end of file
+
+        batches = sensor_batches(zone_id, start, stop, wanted)
+        if wants_ndjson(request, format):
+            return StreamingResponse(ndjson_lines(batches), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+        sensors = [sensor for batch in batches for sensor in batch]
+        # Rendered here rather than by FastAPI so serialization is timed as its own stage
+        with stage("serialize"):
+            return JSONResponse(sensors, headers=headers)
+
+@app.get("/health/history/{zone_id}")
+def get_health_history(zone_id: str, metric: str = "icu_occupancy_percent",
+                       start: Optional[float] = Query(None, ge=0, le=MAX_TIMESTAMP),
+                       end: Optional[float] = Query(None, ge=0, le=MAX_TIMESTAMP), resolution: str = "auto"):
+    if metric not in TRACKED_METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric, expected one of {TRACKED_METRICS}")
+    if resolution not in ("auto", "raw", "1m", "1h"):
+        raise HTTPException(status_code=400, detail="Resolution must be auto, raw, 1m or 1h")
+
+    end = end if end is not None else time.time()
+    start = start if start is not None else max(0.0, end - 3600)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    STORE.flush()
+    return STORE.query(zone_id, metric, start, end, resolution)
@@ -1,27 +1,151 @@
 from fastapi import FastAPI, HTTPException
+from prometheus_client import make_asgi_app
 from pydantic import BaseModel
+import asyncio
+import httpx
+import os
+import time
+
+from registry_log import RegistryLog
+from runtime_metrics import start_runtime_monitor, stop_runtime_monitor
 
 app = FastAPI()
 
-service_store = {}
+metrics_app = make_asgi_app()
+app.mount("/metrics", metrics_app)
+
+# Event-loop lag, threadpool saturation and GC pauses; THREADPOOL_SIZE resizes the pool
+@app.on_event("startup")
+async def start_runtime_metrics():
+    await start_runtime_monitor()
+
+@app.on_event("shutdown")
+async def stop_runtime_metrics():
+    await stop_runtime_monitor()
+
+# Entries whose last heartbeat is older than this are not handed out
+HEARTBEAT_TTL = float(os.getenv("HEARTBEAT_TTL_SECONDS", 30))
+
+# "primary" accepts registrations; "replica" mirrors a primary and is read-only
+REGISTRY_MODE = os.getenv("REGISTRY_MODE", "primary")
+PRIMARY_URL = os.getenv("REGISTRY_PRIMARY_URL", "http://service_registry:8000")
+REPLICA_SYNC_INTERVAL = float(os.getenv("REPLICA_SYNC_INTERVAL_SECONDS", 2))
+
+SNAPSHOT_INTERVAL = float(os.getenv("REGISTRY_SNAPSHOT_INTERVAL_SECONDS", 30))
+REGISTRY_LOG = RegistryLog(os.getenv("REGISTRY_DATA_DIR", "data"))
+
+def load_service_store():
+    started = time.perf_counter()
+    table = REGISTRY_LOG.load()
+    # Restored entries get a fresh heartbeat so lookups work until the services check in again
+    now = time.time()
+    store = {name: {**entry, "last_heartbeat": now} for name, entry in table.items()}
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"Restored {len(store)} services in {elapsed_ms:.1f}ms ({REGISTRY_MODE} mode)")
+    return store
+
+service_store = load_service_store()
 
 class ServiceRegistration(BaseModel):
     name: str
     url: str
+    ready: bool = True
+
+def is_available(entry: dict) -> bool:
+    if REGISTRY_MODE == "replica":
+        # Keep serving the primary's last view while it is unreachable
+        return entry.get("available", False)
+    return entry["ready"] and time.time() - entry["last_heartbeat"] <= HEARTBEAT_TTL
+
+def durable_fields(entry: dict) -> dict:
+    return {key: value for key, value in entry.items() if key != "last_heartbeat"}
+
+def take_snapshot():
+    with REGISTRY_LOG.lock:
+        if REGISTRY_LOG.pending:
+            REGISTRY_LOG.snapshot({name: durable_fields(entry) for name, entry in service_store.items()})
+
+async def snapshot_loop():
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        await asyncio.to_thread(take_snapshot)
+
+async def sync_from_primary(client):
+    response = await client.get(f"{PRIMARY_URL}/")
+    response.raise_for_status()
+    table = response.json()
+    with REGISTRY_LOG.lock:
+        for name, entry in table.items():
+            previous = service_store.get(name)
+            service_store[name] = entry
+            if previous is None or durable_fields(previous) != durable_fields(entry):
+                REGISTRY_LOG.append(name, durable_fields(entry))
+
+async def replica_sync_loop():
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while True:
+            try:
+                await sync_from_primary(client)
+            except httpx.HTTPError as e:
+                print(f"Replica sync failed, serving last known table: {e}")
+            await asyncio.sleep(REPLICA_SYNC_INTERVAL)
+
+BACKGROUND_TASKS = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    BACKGROUND_TASKS.append(asyncio.create_task(snapshot_loop()))
+    if REGISTRY_MODE == "replica":
+        BACKGROUND_TASKS.append(asyncio.create_task(replica_sync_loop()))
+
+@app.on_event("shutdown")
+def stop_background_tasks():
+    for task in BACKGROUND_TASKS:
+        task.cancel()
+    BACKGROUND_TASKS.clear()
+    take_snapshot()
 
 @app.post("/register")
 def register_service(service: ServiceRegistration):
-    service_store[service.name] = service.url
-    print(f"Registered service: {service.name} at {service.url}")
+    if REGISTRY_MODE == "replica":
+        raise HTTPException(status_code=403, detail="Registry replica is read-only")
+
+    with REGISTRY_LOG.lock:
+        previous = service_store.get(service.name)
+        service_store[service.name] = {
+            "url": service.url,
+            "ready": service.ready,
+            "last_heartbeat": time.time()
+        }
+        # Heartbeats only refresh the timestamp; only real changes hit the log
+        changed = previous is None or previous["url"] != service.url or previous["ready"] != service.ready
+        if changed:
+            REGISTRY_LOG.append(service.name, {"url": service.url, "ready": service.ready})
+
+    if changed:
+        print(f"Registered service: {service.name} at {service.url} (ready={service.ready})")
     return {"status": "registered", "service": service.name}
 
 @app.get("/discover/{service_name}")
 def discover_service(service_name: str):
-    url = service_store.get(service_name)
-    if not url:
+    entry = service_store.get(service_name)
+    if not entry:
         raise HTTPException(status_code=404, detail="Service not found")
-    return {"url": url}
+    if not is_available(entry):
+        raise HTTPException(status_code=503, detail="Service not ready")
+    return {"url": entry["url"]}
+
+@app.get("/live")
+def liveness():
+    return {"status": "alive"}
+
+@app.get("/ready")
+def readiness():
+    return {"status": "ready", "mode": REGISTRY_MODE}
 
 @app.get("/")
 def get_all_services():
-    return service_store
\ No newline at end of file
+    return {
+        name: {**entry, "available": is_available(entry)}
+        for name, entry in service_store.items()
+    }
@@ -0,0 +1,74 @@
+import json
+import os
+import threading
+from typing import Dict
+
+
+class RegistryLog:
+    """Append-only change log plus periodic snapshot for the service table.
+
+    Callers hold ``lock`` while mutating the table and appending, so a
+    snapshot never races with a write it would then truncate away.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, "snapshot.json")
+        self.log_path = os.path.join(directory, "registry.log")
+        self.lock = threading.RLock()
+        self.pending = 0
+        self._log = None
+
+    def load(self) -> Dict[str, dict]:
+        table: Dict[str, dict] = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as f:
+                table = json.load(f)["services"]
+
+        if os.path.exists(self.log_path):
+            good_bytes = 0
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("unterminated record")
+                        record = json.loads(line)
+                    except ValueError:
+                        # A crash can leave a torn last line behind
+                        break
+                    table[record["name"]] = record["entry"]
+                    good_bytes += len(line)
+                    self.pending += 1
+
+            # Cut the torn tail off, otherwise later appends would land behind it and be lost too
+            if good_bytes < os.path.getsize(self.log_path):
+                print(f"Truncating torn registry log at byte {good_bytes}")
+                with open(self.log_path, "r+b") as f:
+                    f.truncate(good_bytes)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+        self._log = open(self.log_path, "a")
+        return table
+
+    def append(self, name: str, entry: dict):
+        self._log.write(json.dumps({"name": name, "entry": entry}) + "\n")
+        self._log.flush()
+        self.pending += 1
+
+    def snapshot(self, table: Dict[str, dict]):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"services": table}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        self._log.close()
+        self._log = open(self.log_path, "w")
+        self.pending = 0
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
@@ -0,0 +1,61 @@
+import sys
+import os
+import asyncio
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("REGISTRY_DATA_DIR", tempfile.mkdtemp())
+
+import httpx
+from fastapi.testclient import TestClient
+import main
+
+client = TestClient(main.app)
+
+def register(name, ready=True, url=None):
+    return client.post("/register", json={"name": name, "url": url or f"http://{name}:8000", "ready": ready})
+
+def test_discover_returns_registered_url():
+    assert register("alpha").status_code == 200
+    response = client.get("/discover/alpha")
+    assert response.status_code == 200
+    assert response.json() == {"url": "http://alpha:8000"}
+
+def test_discover_unknown_service_is_404():
+    assert client.get("/discover/nobody").status_code == 404
+
+# Services that are draining or have stopped heartbeating are not handed out
+def test_discover_skips_not_ready_and_stale_services(monkeypatch):
+    register("draining", ready=False)
+    assert client.get("/discover/draining").status_code == 503
+
+    register("stale")
+    monkeypatch.setattr(main, "HEARTBEAT_TTL", 0)
+    main.service_store["stale"]["last_heartbeat"] -= 1
+    assert client.get("/discover/stale").status_code == 503
+    assert client.get("/").json()["stale"]["available"] is False
+
+def test_replica_rejects_registration(monkeypatch):
+    monkeypatch.setattr(main, "REGISTRY_MODE", "replica")
+    assert register("beta").status_code == 403
+    assert "beta" not in main.service_store
+
+# A replica mirrors the primary's table and its view of availability
+def test_replica_syncs_from_primary(monkeypatch):
+    table = {
+        "gamma": {"url": "http://gamma:8000", "ready": True, "last_heartbeat": 0, "available": True},
+        "delta": {"url": "http://delta:8000", "ready": True, "last_heartbeat": 0, "available": False},
+    }
+
+    def handler(request):
+        assert str(request.url) == f"{main.PRIMARY_URL}/"
+        return httpx.Response(200, json=table)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as primary:
+            await main.sync_from_primary(primary)
+
+    monkeypatch.setattr(main, "REGISTRY_MODE", "replica")
+    asyncio.run(run())
+    assert client.get("/discover/gamma").json() == {"url": "http://gamma:8000"}
+    assert client.get("/discover/delta").status_code == 503
@@ -0,0 +1,37 @@
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from registry_log import RegistryLog
+
+def test_load_replays_snapshot_and_log():
+    directory = tempfile.mkdtemp()
+    log = RegistryLog(directory)
+    log.load()
+    log.append("a", {"url": "http://a", "ready": True})
+    log.snapshot({"a": {"url": "http://a", "ready": True}})
+    log.append("b", {"url": "http://b", "ready": True})
+    log.close()
+
+    table = RegistryLog(directory).load()
+    assert set(table) == {"a", "b"}
+
+# A torn last line is cut off so records appended after the crash survive the next boot
+def test_torn_line_does_not_hide_later_appends():
+    directory = tempfile.mkdtemp()
+    log = RegistryLog(directory)
+    log.load()
+    log.append("a", {"url": "http://a", "ready": True})
+    log.close()
+    with open(os.path.join(directory, "registry.log"), "a") as f:
+        f.write('{"name": "b", "entry": {"url": "ht')
+
+    log = RegistryLog(directory)
+    assert set(log.load()) == {"a"}
+    log.append("c", {"url": "http://c", "ready": True})
+    log.close()
+
+    table = RegistryLog(directory).load()
+    assert set(table) == {"a", "c"}
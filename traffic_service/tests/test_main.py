@@ -1,7 +1,11 @@
 import sys
 import os
+import json
+import tempfile
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TSDB_PATH", os.path.join(tempfile.mkdtemp(), "readings.db"))
+os.environ.setdefault("FAULTS_ADMIN_ENABLED", "true")
 
 from fastapi.testclient import TestClient
 from main import app, ZONE_CONFIG
@@ -38,4 +42,178 @@ def test_zone_persistence():
     resp2 = client.get(f"/traffic/zone/{zone_id}")
     count2 = len(resp2.json())
     
-    assert count1 == count2
\ No newline at end of file
+    assert count1 == count2
+
+# Verify that readings served by the zone endpoint are stored and queryable
+def test_history_returns_recorded_readings():
+    zone_id = "HISTORY_TEST_UNIT"
+    sensors = client.get(f"/traffic/zone/{zone_id}").json()
+
+    response = client.get(f"/traffic/history/{zone_id}", params={"resolution": "raw"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["resolution"] == "raw"
+    assert len(data["points"]) == len(sensors)
+    assert {p["sensor"] for p in data["points"]} == {s["id"] for s in sensors}
+
+# Verify that long windows are answered from the rollups
+def test_history_uses_rollups_for_long_windows():
+    zone_id = "ROLLUP_TEST_UNIT"
+    client.get(f"/traffic/zone/{zone_id}")
+    client.get(f"/traffic/zone/{zone_id}")
+
+    response = client.get(f"/traffic/history/{zone_id}", params={"start": 0})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["resolution"] == "1h"
+    assert sum(p["count"] for p in data["points"]) == 2 * ZONE_CONFIG[zone_id]
+    for point in data["points"]:
+        assert point["min"] <= point["avg"] <= point["max"]
+
+def test_history_rejects_unknown_metric():
+    response = client.get("/traffic/history/A", params={"metric": "bogus"})
+    assert response.status_code == 400
+
+# Out of range and non-finite windows are rejected by validation instead of failing with a 500
+def test_history_rejects_invalid_windows():
+    for params in ({"start": -1e15}, {"start": "nan"}, {"end": 1e20}, {"end": "inf"}):
+        assert client.get("/traffic/history/A", params=params).status_code == 422
+    assert client.get("/traffic/history/A", params={"start": 10, "end": 5}).status_code == 400
+
+# Raw windows denser than the point cap are answered from the 1m rollup
+def test_history_steps_up_past_point_cap(monkeypatch):
+    import timeseries
+    zone_id = "CAPPED_TEST_UNIT"
+    ZONE_CONFIG[zone_id] = 30
+    client.get(f"/traffic/zone/{zone_id}")
+
+    monkeypatch.setattr(timeseries, "MAX_QUERY_POINTS", 10)
+    data = client.get(f"/traffic/history/{zone_id}", params={"resolution": "raw"}).json()
+    assert data["resolution"] == "1m"
+    assert data["requested_resolution"] == "raw"
+    assert len(data["points"]) <= 10
+    assert sum(p["count"] for p in data["points"]) == 30
+
+def test_liveness():
+    response = client.get("/live")
+    assert response.status_code == 200
+
+# Not ready until the startup hooks have run
+def test_readiness_follows_startup():
+    assert client.get("/ready").status_code == 503
+    with TestClient(app) as started_client:
+        assert started_client.get("/ready").status_code == 200
+    assert client.get("/ready").status_code == 503
+
+# Verify that ?fields= trims every sensor to the requested keys
+def test_zone_field_projection():
+    response = client.get("/traffic/zone/TEST_ZONE", params={"fields": "id,status"})
+    assert response.status_code == 200
+    for sensor in response.json():
+        assert set(sensor) == {"id", "status"}
+
+def test_zone_rejects_unknown_fields():
+    response = client.get("/traffic/zone/TEST_ZONE", params={"fields": "id,bogus"})
+    assert response.status_code == 400
+
+# Switching profiles at runtime changes how zone requests behave
+def test_fault_profile_outage():
+    assert client.post("/admin/faults/preset/outage").status_code == 200
+    try:
+        assert client.get("/traffic/zone/TEST_ZONE").status_code == 503
+        # Probes are never affected
+        assert client.get("/live").status_code == 200
+    finally:
+        client.delete("/admin/faults")
+    assert client.get("/traffic/zone/TEST_ZONE").status_code == 200
+
+def test_fault_profile_drip_keeps_body_intact():
+    profile = {"drip_rate": 1.0, "drip_chunk_bytes": 16, "drip_interval_ms": 0}
+    assert client.put("/admin/faults", json=profile).status_code == 200
+    try:
+        response = client.get("/traffic/zone/TEST_ZONE")
+        assert response.status_code == 200
+        assert len(response.json()) > 0
+    finally:
+        client.delete("/admin/faults")
+
+def test_fault_profile_rejects_invalid_rates():
+    response = client.put("/admin/faults", json={"error_rate": 2})
+    assert response.status_code == 422
+
+def test_fault_admin_is_opt_in(monkeypatch):
+    import faults
+    monkeypatch.setattr(faults, "ADMIN_ENABLED", False)
+    assert client.post("/admin/faults/preset/outage").status_code == 404
+    assert client.get("/traffic/zone/TEST_ZONE").status_code == 200
+
+# Walking the cursors visits every sensor exactly once
+def test_zone_cursor_pagination():
+    zone_id = "PAGED_TEST_UNIT"
+    ZONE_CONFIG[zone_id] = 1200
+
+    seen = []
+    params = {"limit": 500, "fields": "id"}
+    while True:
+        response = client.get(f"/traffic/zone/{zone_id}", params=params)
+        assert response.status_code == 200
+        seen.extend(sensor["id"] for sensor in response.json())
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        params["cursor"] = next_cursor
+
+    assert len(seen) == 1200
+    assert len(set(seen)) == 1200
+
+def test_zone_rejects_foreign_cursor():
+    page = client.get("/traffic/zone/PAGED_TEST_UNIT", params={"limit": 1})
+    cursor = page.headers["X-Next-Cursor"]
+    response = client.get("/traffic/zone/TEST_ZONE", params={"cursor": cursor})
+    assert response.status_code == 400
+
+def test_zone_streams_ndjson():
+    zone_id = "STREAM_TEST_UNIT"
+    ZONE_CONFIG[zone_id] = 1100
+
+    response = client.get(f"/traffic/zone/{zone_id}", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert len(lines) == 1100
+    assert json.loads(lines[-1])["zone"] == zone_id
+
+# The profiler only answers when enabled, and zone requests feed the stage timers
+def test_profile_endpoint_is_opt_in(monkeypatch):
+    import profiling
+    assert client.get("/debug/profile", params={"seconds": 0.1}).status_code == 404
+
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    # Enabling it is not enough without a token to protect it
+    assert client.get("/debug/profile", params={"seconds": 0.1}).status_code == 403
+
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+    assert client.get("/debug/profile", params={"seconds": 0.1}).status_code == 403
+    response = client.get("/debug/profile", params={"seconds": 0.1, "format": "json"},
+                          headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["samples"] > 0
+
+def test_zone_request_records_stage_timings():
+    from prometheus_client import REGISTRY
+    before = REGISTRY.get_sample_value("app_stage_seconds_count", {"stage": "generate"}) or 0
+    client.get("/traffic/zone/TEST_ZONE")
+    assert REGISTRY.get_sample_value("app_stage_seconds_count", {"stage": "generate"}) > before
+    assert REGISTRY.get_sample_value("app_stage_seconds_count", {"stage": "serialize"}) > 0
+
+# Injected latency is not mistaken for threadpool wait
+def test_threadpool_wait_excludes_fault_latency():
+    from prometheus_client import REGISTRY
+    assert client.put("/admin/faults", json={"latency_ms": 200}).status_code == 200
+    try:
+        before = REGISTRY.get_sample_value("app_stage_seconds_sum", {"stage": "threadpool_wait"}) or 0
+        assert client.get("/traffic/zone/TEST_ZONE").status_code == 200
+        waited = REGISTRY.get_sample_value("app_stage_seconds_sum", {"stage": "threadpool_wait"}) - before
+    finally:
+        client.delete("/admin/faults")
+    assert waited < 0.1
@@ -0,0 +1,53 @@
+import sys
+import os
+import asyncio
+import gc
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anyio import to_thread
+from prometheus_client import REGISTRY
+from runtime_metrics import STATE, gc_callback, start_runtime_monitor, stop_runtime_monitor
+
+def sample(name, labels=None):
+    return REGISTRY.get_sample_value(name, labels or {})
+
+# Blocking the loop and saturating the pool both show up in the gauges
+def test_monitor_reports_loop_lag_and_threadpool_saturation():
+    async def run():
+        await start_runtime_monitor(threadpool_size="3", interval=0.05)
+        try:
+            assert to_thread.current_default_thread_limiter().total_tokens == 3
+            # Let the monitor arm its timer before the loop is blocked
+            await asyncio.sleep(0.01)
+            lag_before = sample("app_event_loop_lag_seconds_sum") or 0
+
+            time.sleep(0.2)
+            await asyncio.sleep(0.1)
+            assert sample("app_event_loop_lag_seconds_sum") - lag_before >= 0.1
+
+            workers = [asyncio.ensure_future(to_thread.run_sync(time.sleep, 0.3)) for _ in range(5)]
+            await asyncio.sleep(0.15)
+            assert sample("app_threadpool_size") == 3
+            assert sample("app_threadpool_active_threads") == 3
+            assert sample("app_threadpool_queue_depth") == 2
+            await asyncio.gather(*workers)
+        finally:
+            await stop_runtime_monitor()
+
+    asyncio.run(run())
+    assert STATE["task"] is None
+    assert gc_callback not in gc.callbacks
+
+def test_gc_callback_records_pauses():
+    async def run():
+        await start_runtime_monitor(threadpool_size=None, interval=0.05)
+        try:
+            before = sample("app_gc_pause_seconds_count", {"generation": "2"}) or 0
+            gc.collect()
+            assert sample("app_gc_pause_seconds_count", {"generation": "2"}) == before + 1
+        finally:
+            await stop_runtime_monitor()
+
+    asyncio.run(run())
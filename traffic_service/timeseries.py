@@ -0,0 +1,220 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Rollup tables kept next to the raw points, keyed by name -> bucket width (s)
+RESOLUTIONS: Dict[str, int] = {"1m": 60, "1h": 3600}
+
+RETENTION_SECONDS: Dict[str, int] = {
+    "raw": int(os.getenv("TSDB_RAW_RETENTION_SECONDS", 6 * 3600)),
+    "1m": int(os.getenv("TSDB_1M_RETENTION_SECONDS", 7 * 24 * 3600)),
+    "1h": int(os.getenv("TSDB_1H_RETENTION_SECONDS", 365 * 24 * 3600)),
+}
+
+# Longest window answered from each table when resolution="auto"
+AUTO_MAX_SPAN: Dict[str, int] = {"raw": 3600, "1m": 2 * 24 * 3600}
+
+RETENTION_INTERVAL = 60.0
+
+# Most points a single query returns; denser windows are answered from the next rollup
+MAX_QUERY_POINTS = int(os.getenv("TSDB_MAX_QUERY_POINTS", 10000))
+# Latest timestamp datetime can represent (9999-12-31T23:59:59)
+MAX_TIMESTAMP = 253402300799.0
+
+COARSER = {"raw": "1m", "1m": "1h"}
+
+
+class TimeSeriesStore:
+    """Embedded SQLite (WAL) store for sensor readings with 1m/1h rollups."""
+
+    def __init__(self, path: str, flush_interval: float = 1.0, batch_size: int = 500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._buffer: List[tuple] = []
+        self._buffer_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_retention = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._db_lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS raw ("
+                "metric TEXT, zone TEXT, sensor TEXT, ts REAL, value REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS raw_lookup ON raw (zone, metric, ts)")
+            for name in RESOLUTIONS:
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS rollup_{name} ("
+                    "metric TEXT, zone TEXT, bucket INTEGER, count INTEGER, "
+                    "total REAL, min_value REAL, max_value REAL, "
+                    "PRIMARY KEY (zone, metric, bucket))"
+                )
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="tsdb-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.time() - self._last_retention >= RETENTION_INTERVAL:
+                    self.enforce_retention()
+            except sqlite3.Error as e:
+                print(f"TSDB flush failed: {e}")
+
+    def record(self, zone_id: str, sensors: List[dict], metrics: List[str]):
+        """Queue one reading per sensor and metric; written by the flusher."""
+        now = time.time()
+        rows = [
+            (metric, zone_id, sensor["id"], now, float(sensor[metric]))
+            for sensor in sensors
+            for metric in metrics
+        ]
+        with self._buffer_lock:
+            self._buffer.extend(rows)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        with self._buffer_lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+
+        # Pre-aggregate the batch so every rollup bucket is a single upsert
+        rollups: Dict[str, Dict[tuple, list]] = {name: {} for name in RESOLUTIONS}
+        for metric, zone, _, ts, value in rows:
+            for name, step in RESOLUTIONS.items():
+                key = (metric, zone, int(ts // step) * step)
+                agg = rollups[name].get(key)
+                if agg is None:
+                    rollups[name][key] = [1, value, value, value]
+                else:
+                    agg[0] += 1
+                    agg[1] += value
+                    agg[2] = min(agg[2], value)
+                    agg[3] = max(agg[3], value)
+
+        with self._db_lock, self._conn:
+            self._conn.executemany("INSERT INTO raw VALUES (?, ?, ?, ?, ?)", rows)
+            for name, buckets in rollups.items():
+                self._conn.executemany(
+                    f"INSERT INTO rollup_{name} VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (zone, metric, bucket) DO UPDATE SET "
+                    "count = count + excluded.count, "
+                    "total = total + excluded.total, "
+                    "min_value = MIN(min_value, excluded.min_value), "
+                    "max_value = MAX(max_value, excluded.max_value)",
+                    [key + tuple(agg) for key, agg in buckets.items()],
+                )
+        return len(rows)
+
+    def enforce_retention(self, now: Optional[float] = None):
+        now = now if now is not None else time.time()
+        with self._db_lock, self._conn:
+            self._conn.execute("DELETE FROM raw WHERE ts < ?", (now - RETENTION_SECONDS["raw"],))
+            for name in RESOLUTIONS:
+                self._conn.execute(
+                    f"DELETE FROM rollup_{name} WHERE bucket < ?",
+                    (now - RETENTION_SECONDS[name],),
+                )
+        self._last_retention = now
+
+    def pick_resolution(self, start: float, end: float) -> str:
+        span = end - start
+        oldest_raw = time.time() - RETENTION_SECONDS["raw"]
+        if span <= AUTO_MAX_SPAN["raw"] and start >= oldest_raw:
+            return "raw"
+        if span <= AUTO_MAX_SPAN["1m"]:
+            return "1m"
+        return "1h"
+
+    def query(self, zone_id: str, metric: str, start: float, end: float, resolution: str = "auto") -> dict:
+        """Points for [start, end]; steps up to coarser rollups past MAX_QUERY_POINTS."""
+        requested = resolution
+        if resolution == "auto":
+            resolution = self.pick_resolution(start, end)
+
+        while True:
+            rows = self._fetch(zone_id, metric, start, end, resolution, MAX_QUERY_POINTS + 1)
+            if len(rows) <= MAX_QUERY_POINTS or resolution not in COARSER:
+                break
+            resolution = COARSER[resolution]
+
+        truncated = len(rows) > MAX_QUERY_POINTS
+        rows = rows[:MAX_QUERY_POINTS]
+        if resolution == "raw":
+            points = [
+                {"timestamp": datetime.utcfromtimestamp(ts).isoformat(), "sensor": sensor, "value": value}
+                for ts, sensor, value in rows
+            ]
+        else:
+            points = [
+                {
+                    "timestamp": datetime.utcfromtimestamp(bucket).isoformat(),
+                    "count": count,
+                    "avg": round(total / count, 3),
+                    "min": min_value,
+                    "max": max_value,
+                }
+                for bucket, count, total, min_value, max_value in rows
+            ]
+
+        return {
+            "zone": zone_id,
+            "metric": metric,
+            "resolution": resolution,
+            "requested_resolution": requested,
+            "truncated": truncated,
+            "start": datetime.utcfromtimestamp(start).isoformat(),
+            "end": datetime.utcfromtimestamp(end).isoformat(),
+            "points": points,
+        }
+
+    def _fetch(self, zone_id: str, metric: str, start: float, end: float, resolution: str, limit: int) -> List[tuple]:
+        with self._db_lock:
+            if resolution == "raw":
+                return self._conn.execute(
+                    "SELECT ts, sensor, value FROM raw "
+                    "WHERE zone = ? AND metric = ? AND ts >= ? AND ts <= ? ORDER BY ts LIMIT ?",
+                    (zone_id, metric, start, end, limit),
+                ).fetchall()
+            step = RESOLUTIONS[resolution]
+            return self._conn.execute(
+                f"SELECT bucket, count, total, min_value, max_value FROM rollup_{resolution} "
+                "WHERE zone = ? AND metric = ? AND bucket >= ? AND bucket <= ? ORDER BY bucket LIMIT ?",
+                (zone_id, metric, int(start // step) * step, end, limit),
+            ).fetchall()